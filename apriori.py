@@ -1,33 +1,44 @@
-import csv
 import collections
 import itertools
+import multiprocessing
+
+import numpy as np
 
 import data_mining_utilities
+import instrumentation
+
+
+def load_attribute(full_data, attribute_name, chunk_size=data_mining_utilities.CSV_CHUNK_SIZE):
+    """ Extract an attribute from the full dataset (a CSV file name, or its rows as dicts) """
+    columns, _ = data_mining_utilities.load_columns(full_data, nominal_columns={attribute_name: None},
+                                                    chunk_size=chunk_size)
+    return list(columns[attribute_name])
 
 
-def load_attribute(full_data, attribute_name):
-    """ Extract an attribute from the full dataset """
-    attribute = []
+def load_transactions(file_name, attribute_name, delimiters, cache_dir=None):
+    """ Load an attribute split into cleaned transactions, through the columnar cache """
+    def build():
+        data = load_attribute(file_name, attribute_name)
+        return {attribute_name: data_mining_utilities.clean_data_nominal_delimited(data, delimiters)}
 
-    # iterate over each row, extract the value for the attribute
-    for row in full_data:
-        attribute.append(row[attribute_name])
+    if cache_dir is None:
+        return build()[attribute_name]
 
-    return attribute
+    parameters = {'columns': [attribute_name], 'delimiters': delimiters,
+                  'loader': 'apriori.load_transactions'}
+    return data_mining_utilities.cached_columns(file_name, parameters, build, cache_dir)[attribute_name]
 
 
 def find_1_item_sets(transactions):
     """ Get the unique 1-itemsets """
-    single_item_sets = []
+    single_items = collections.OrderedDict()  # only unique items, in order of first appearance
 
     for transaction in transactions:
         for item in transaction:
-            if [item] not in single_item_sets:  # only unique items
-                single_item_sets.append([item])
+            single_items[item] = None
 
     # convert to a frozenset to be hashable (to be used as a dictionary key)
-    return list(map(frozenset, single_item_sets))
-
+    return [frozenset([item]) for item in single_items]
 
 
 def scan(transactions, candidates):
@@ -43,6 +54,63 @@ def scan(transactions, candidates):
 
 
 
+def popcount(bitmap):
+    """ Number of set bits in an integer bitmap """
+    return bin(bitmap).count("1")
+
+
+if hasattr(int, "bit_count"):  # Python 3.10+ counts the bits natively
+    popcount = int.bit_count
+
+
+def item_bitmaps(transactions):
+    """ Vertical layout of the transactions: a TID bitmap per item, bit i set if transaction i contains the item """
+    # OR-ing bit after bit into a growing int would copy the bitmap every time (O(N^2)), so the TIDs of each
+    # item are collected first and every bitmap is packed in one go
+    tids = collections.defaultdict(lambda: list())
+    num_transactions = 0
+    for tid, transaction in enumerate(transactions):
+        for item in transaction:
+            tids[item].append(tid)
+        num_transactions = tid + 1
+
+    bitmaps = {}
+    num_bytes = (num_transactions + 7) // 8
+    for item, item_tids in tids.items():
+        item_tids = np.array(item_tids, dtype=np.int64)
+        packed = np.zeros(num_bytes, dtype=np.uint8)
+        np.bitwise_or.at(packed, item_tids >> 3, np.left_shift(1, item_tids & 7).astype(np.uint8))
+        bitmaps[item] = int.from_bytes(packed.tobytes(), "little")
+
+    return bitmaps
+
+
+def scan_bitmaps(bitmaps, candidates, itemset_bitmaps=None):
+    """ Find the support count of a set of candidates by intersecting TID bitmaps """
+    support_counts = collections.defaultdict(lambda: 0)
+    candidate_bitmaps = {}
+
+    for candidate in candidates:
+        items = sorted(candidate)
+        prefix = frozenset(items[:-1])
+
+        # extend the bitmap of the candidate's (k-1)-prefix from the previous level if it's known,
+        # otherwise intersect the bitmaps of every item in the candidate
+        if itemset_bitmaps is not None and prefix in itemset_bitmaps:
+            bitmap = itemset_bitmaps[prefix] & bitmaps.get(items[-1], 0)
+        else:
+            bitmap = ~0
+            for item in items:
+                bitmap &= bitmaps.get(item, 0)
+
+        support = popcount(bitmap) if bitmap > 0 else 0
+        if support > 0:  # same as 'scan', candidates without any support are left out
+            support_counts[candidate] = support
+            candidate_bitmaps[candidate] = bitmap
+
+    return support_counts, candidate_bitmaps
+
+
 def discard(candidates, support_threshold):
     """ Discard candidates that don't have the minimum level of support """
     frequent_itemsets = []
@@ -59,24 +127,22 @@ def join(freq_itemsets, k):
     """ Generate a new set of k-item candidates """
     new_candidates = []
 
-    num_of_sets = len(freq_itemsets)
-
-    for i in range(num_of_sets):
-        for j in range(i + 1, num_of_sets):  # don't compare the candidate with itself
-            set_1 = list(freq_itemsets[i])
-            set_1.sort()  # apriori depends on the item set being ordered
-            start_set_1 = set_1[:-1]  # all elements except the last one
+    frequent = set(freq_itemsets)  # hashed for the downward-closure check
 
-            set_2 = list(freq_itemsets[j])
-            set_2.sort()
-            start_set_2 = set_2[:-1]
+    # sort each itemset once, then group the itemsets by their first k - 2 items
+    # apriori depends on the item set being ordered
+    prefix_groups = collections.defaultdict(lambda: list())
+    for itemset in sorted(tuple(sorted(itemset)) for itemset in freq_itemsets):
+        prefix_groups[itemset[:-1]].append(itemset[-1])
 
-            # combine the two itemsets if all elements except the last are the same
-            if start_set_1 == start_set_2:
-                new_candidate = freq_itemsets[i].union(freq_itemsets[j])  # combine the two (entire) item sets
+    # only itemsets sharing a prefix can be combined (all elements except the last are the same)
+    for prefix, last_items in prefix_groups.items():
+        for i in range(len(last_items)):
+            for j in range(i + 1, len(last_items)):  # don't compare the candidate with itself
+                new_candidate = frozenset(prefix + (last_items[i], last_items[j]))
 
                 # prune candidates with infrequent subsets
-                if not has_infrequent_subset(new_candidate, freq_itemsets, k):
+                if not has_infrequent_subset(new_candidate, frequent, k):
                     new_candidates.append(new_candidate)
 
     return new_candidates
@@ -84,13 +150,87 @@ def join(freq_itemsets, k):
 
 def has_infrequent_subset(new_candidate, freq_itemsets, k):
     """ Check if a generated candidate's subsets are all frequent """
-    subsets = list(itertools.combinations(new_candidate, k - 1))  # generate subsets of the candidate of length k - 1
+    if not isinstance(freq_itemsets, (set, frozenset)):
+        freq_itemsets = set(freq_itemsets)
 
-    for subset in subsets:
+    # generate subsets of the candidate of length k - 1
+    for subset in itertools.combinations(new_candidate, k - 1):
         if frozenset(subset) not in freq_itemsets:  # a subset is not frequent
             return True
-        else:
-            return False
+
+    return False
+
+
+class HashTree:
+    """ Hash tree of k-item candidates, for finding every candidate contained in a transaction """
+
+    def __init__(self, candidates, k, fanout=8, max_leaf_size=16):
+        self.k = k
+        self.fanout = fanout
+        self.max_leaf_size = max_leaf_size
+        self.root = []  # a leaf is a list of candidates, an interior node is a dict of hash bucket -> child
+
+        for candidate in candidates:
+            self._insert(tuple(sorted(candidate)), candidate)
+
+    def _bucket(self, item):
+        return hash(item) % self.fanout
+
+    def _insert(self, items, candidate):
+        node, parent, bucket, depth = self.root, None, None, 0
+
+        while isinstance(node, dict):  # descend the interior nodes by hashing the next item
+            parent, bucket = node, self._bucket(items[depth])
+            node = node.setdefault(bucket, [])
+            depth += 1
+
+        node.append((items, candidate))
+
+        # split a full leaf, unless every item of its candidates has already been hashed
+        if len(node) > self.max_leaf_size and depth < self.k:
+            interior = {}
+            for leaf_items, leaf_candidate in node:
+                interior.setdefault(self._bucket(leaf_items[depth]), []).append((leaf_items, leaf_candidate))
+            if parent is None:
+                self.root = interior
+            else:
+                parent[bucket] = interior
+
+    def subsets(self, transaction):
+        """ The candidates contained in a transaction """
+        items = sorted(set(transaction))
+        item_set = set(items)
+        found = set()  # a leaf can be reached by more than one path, only count each candidate once
+
+        def visit(node, depth, start):
+            if isinstance(node, list):
+                for candidate_items, candidate in node:
+                    if candidate not in found and item_set.issuperset(candidate_items):
+                        found.add(candidate)
+                return
+
+            # hash every item that could still be the depth-th item of a contained candidate
+            for i in range(start, len(items) - (self.k - depth) + 1):
+                child = node.get(self._bucket(items[i]))
+                if child is not None:
+                    visit(child, depth + 1, i + 1)
+
+        visit(self.root, 0, 0)
+        return found
+
+
+def scan_hash_tree(transactions, candidates):
+    """ Find the support count of a set of candidates using a hash tree """
+    support_counts = collections.defaultdict(lambda: 0)
+    if len(candidates) == 0:
+        return support_counts
+
+    tree = HashTree(candidates, len(next(iter(candidates))))
+    for transaction in transactions:
+        for candidate in tree.subsets(transaction):
+            support_counts[candidate] += 1
+
+    return support_counts
 
 
 def format_output(freq_items):
@@ -110,56 +250,381 @@ def format_output(freq_items):
     return formatted
 
 
-def apriori(transactions, min_abs_sup):
+def frequent_support(support_counts, frequent_itemsets):
+    """ Support of the frequent itemsets, reused from the candidate support counts """
+    support = collections.defaultdict(lambda: 0)
+    for itemset in frequent_itemsets:
+        support[itemset] = support_counts[itemset]
+    return support
+
+
+def frequent_item_bitmaps(transactions, min_abs_sup):
+    """ (item, TID bitmap) of every frequent item, by increasing support """
+    bitmaps = item_bitmaps(transactions)
+    frequent_items = [(item, bitmap) for item, bitmap in bitmaps.items() if popcount(bitmap) >= max(min_abs_sup, 1)]
+    frequent_items.sort(key=lambda item_bitmap: (popcount(item_bitmap[1]), item_bitmap[0]))
+    return frequent_items
+
+
+def charm_extend(prefix, nodes, min_abs_sup, closed):
+    """ Extend each (items, TID bitmap) node of a prefix, merging nodes that always occur together (CHARM) """
+    removed = set()
+
+    for i, (items_i, bitmap_i) in enumerate(nodes):
+        if i in removed:
+            continue
+
+        items = set(items_i)
+        children = []  # extensions of prefix u items, which can still grow as later nodes are merged in
+
+        for j in range(i + 1, len(nodes)):
+            if j in removed:
+                continue
+            items_j, bitmap_j = nodes[j]
+            bitmap = bitmap_i & bitmap_j
+            if popcount(bitmap) < min_abs_sup:
+                continue
+
+            if bitmap_i == bitmap_j:  # the two always occur together, node j can't be closed on its own
+                removed.add(j)
+                items |= items_j
+            elif bitmap == bitmap_i:  # node j occurs wherever node i does
+                items |= items_j
+            elif bitmap == bitmap_j:  # node i occurs wherever node j does, node j can't be closed on its own
+                removed.add(j)
+                children.append((items_j, bitmap))
+            else:
+                children.append((items_j, bitmap))
+
+        itemset = prefix | items
+        if children:
+            children.sort(key=lambda child: popcount(child[1]))
+            charm_extend(itemset, children, min_abs_sup, closed)
+
+        # a closed itemset is identified by its TID bitmap, non-closed itemsets merge into their closure
+        closed[bitmap_i] = closed.get(bitmap_i, frozenset()) | itemset
+
+
+def charm(transactions, min_abs_sup):
+    """ Closed frequent itemsets (no superset with the same support) and their supports """
+    min_abs_sup = max(min_abs_sup, 1)
+    nodes = [({item}, bitmap) for item, bitmap in frequent_item_bitmaps(transactions, min_abs_sup)]
+
+    closed = {}
+    charm_extend(frozenset(), nodes, min_abs_sup, closed)
+
+    return {itemset: popcount(bitmap) for bitmap, itemset in closed.items()}
+
+
+def max_extend(head, head_bitmap, tail, min_abs_sup, maximal):
+    """ Depth-first search for maximal itemsets below head, with MaxMiner's superset-frequency lookahead """
+    # tail is the (item, TID bitmap of head u item) of every frequent extension of head
+    def subsumed(itemset):
+        return any(itemset <= found for found in maximal)
+
+    def add(itemset, bitmap):
+        if not subsumed(itemset):
+            for found in [found for found in maximal if found < itemset]:
+                del maximal[found]
+            maximal[itemset] = popcount(bitmap)
+
+    if not tail:
+        if head:
+            add(head, head_bitmap)
+        return
+
+    # lookahead: if head together with the whole tail is frequent, nothing smaller below head can be maximal
+    everything = head.union(item for item, _ in tail)
+    everything_bitmap = head_bitmap
+    for _, bitmap in tail:
+        everything_bitmap &= bitmap
+    if popcount(everything_bitmap) >= min_abs_sup:
+        add(everything, everything_bitmap)
+        return
+    if subsumed(everything):
+        return
+
+    for i, (item, bitmap) in enumerate(tail):
+        new_tail = [(other, bitmap & other_bitmap) for other, other_bitmap in tail[i + 1:]]
+        new_tail = [(other, other_bitmap) for other, other_bitmap in new_tail if popcount(other_bitmap) >= min_abs_sup]
+        new_tail.sort(key=lambda item_bitmap: popcount(item_bitmap[1]))
+        max_extend(head | {item}, bitmap, new_tail, min_abs_sup, maximal)
+
+
+def max_miner(transactions, min_abs_sup):
+    """ Maximal frequent itemsets (no frequent superset) and their supports """
+    min_abs_sup = max(min_abs_sup, 1)
+    all_transactions = (1 << len(transactions)) - 1
+
+    maximal = {}
+    max_extend(frozenset(), all_transactions, frequent_item_bitmaps(transactions, min_abs_sup), min_abs_sup, maximal)
+    return maximal
+
+
+def support_from_closed(itemset, closed_supports):
+    """ Support of any itemset, from the closed itemsets: the support of its most frequent closed superset """
+    return max((support for closed, support in closed_supports.items() if itemset <= closed), default=0)
+
+
+def frequent_from_closed(closed_supports):
+    """ Every frequent itemset and its support, recovered from the closed itemsets """
+    supports = {}
+    for closed, support in closed_supports.items():
+        for k in range(1, len(closed) + 1):
+            for subset in itertools.combinations(closed, k):
+                subset = frozenset(subset)
+                supports[subset] = max(supports.get(subset, 0), support)
+    return supports
+
+
+def group_by_size(itemset_supports):
+    """ Itemsets and supports in the shape returned by apriori(): one list/dict per k, ending with an empty level """
+    max_k = max(map(len, itemset_supports), default=0)
+    frequent_itemsets = [[] for _ in range(max_k + 1)]
+    frequent_itemsets_support = [collections.defaultdict(lambda: 0) for _ in range(max_k + 1)]
+
+    for itemset, support in itemset_supports.items():
+        frequent_itemsets[len(itemset) - 1].append(itemset)
+        frequent_itemsets_support[len(itemset) - 1][itemset] = support
+
+    return frequent_itemsets, frequent_itemsets_support
+
+
+def _load_shard(shard):
+    """ A shard is either a list of transactions or a function that loads them (e.g. from its own file) """
+    return shard() if callable(shard) else shard
+
+
+def _mine_shard(task):
+    """ SON phase 1: the itemsets frequent within one shard, at the shard's share of the minimum support """
+    shard, min_abs_sup, num_transactions = task
+    transactions = _load_shard(shard)
+
+    # a globally frequent itemset must reach its proportional share of the support in at least one shard
+    local_min_sup = max(1, -(-min_abs_sup * len(transactions) // num_transactions))
+    return set(frequent_from_closed(charm(transactions, local_min_sup)))
+
+
+def _count_shard(task):
+    """ SON phase 2: the support of every candidate within one shard """
+    shard, candidates = task
+    support_counts, _ = scan_bitmaps(item_bitmaps(_load_shard(shard)), candidates)
+    return dict(support_counts)  # a defaultdict with a lambda can't be sent back from a worker
+
+
+def shard_transactions(transactions, num_shards):
+    """ Split a list of transactions into num_shards contiguous shards """
+    shard_size = -(-len(transactions) // num_shards)
+    return [transactions[start: start + shard_size] for start in range(0, len(transactions), shard_size)]
+
+
+def partitioned_apriori(shards, min_abs_sup, num_transactions=None, processes=None):
+    """ SON-style apriori: mine each shard in a process pool, then count the union of the results in one pass """
+    # shards can be functions that load their transactions, so only one shard per worker is ever in memory,
+    # but then the total number of transactions has to be given up front
+    if num_transactions is None:
+        if any(callable(shard) for shard in shards):
+            raise ValueError("num_transactions is needed when the shards are loaded lazily")
+        num_transactions = sum(len(shard) for shard in shards)
+
+    def run(function, tasks):
+        if processes == 1:
+            return list(map(function, tasks))
+        with multiprocessing.Pool(processes) as pool:
+            return pool.map(function, tasks)
+
+    # phase 1: any globally frequent itemset is locally frequent in at least one shard
+    candidates = set()
+    with instrumentation.phase("apriori.candidate_generation"):
+        for local_frequent in run(_mine_shard, [(shard, min_abs_sup, num_transactions) for shard in shards]):
+            candidates |= local_frequent
+    instrumentation.count("apriori.candidates", len(candidates))
+
+    # phase 2: one global counting pass over every shard
+    candidates = list(candidates)
+    supports = collections.Counter()
+    with instrumentation.phase("apriori.support_counting"):
+        for shard_supports in run(_count_shard, [(shard, candidates) for shard in shards]):
+            supports.update(shard_supports)
+
+    return group_by_size({itemset: support for itemset, support in supports.items() if support >= min_abs_sup})
+
+
+def incremental_apriori(frequent_itemsets_support, old_transactions, new_transactions, min_rel_sup,
+                        num_old_transactions=None):
+    """ FUP-style update of apriori() results with a batch of new transactions """
+    # frequent_itemsets_support must have been mined from old_transactions with a minimum support of
+    # min_rel_sup * num_old_transactions. old_transactions can be a function that loads them, it's only
+    # called (once) if an itemset that wasn't frequent before might have become frequent
+    if num_old_transactions is None:
+        num_old_transactions = len(_load_shard(old_transactions))
+    num_new_transactions = len(new_transactions)
+    min_sup = min_rel_sup * (num_old_transactions + num_new_transactions)
+
+    old_supports = {}
+    for support_k in frequent_itemsets_support:
+        old_supports.update(support_k)
+
+    new_bitmaps = item_bitmaps(new_transactions)
+    old_bitmaps = None
+
+    def update(candidates):
+        """ Support of the candidates in the old and new transactions together """
+        nonlocal old_bitmaps
+        new_supports, _ = scan_bitmaps(new_bitmaps, candidates)
+        supports = {}
+        unknown = []
+
+        for candidate in candidates:
+            if candidate in old_supports:  # frequent before, its old support is already known
+                supports[candidate] = old_supports[candidate] + new_supports[candidate]
+            elif new_supports[candidate] >= min_rel_sup * num_new_transactions:
+                # infrequent in the old transactions, it can only be frequent now if it's frequent in the new ones
+                unknown.append(candidate)
+
+        if unknown:
+            if old_bitmaps is None:
+                old_bitmaps = item_bitmaps(_load_shard(old_transactions))
+            unknown_supports, _ = scan_bitmaps(old_bitmaps, unknown)
+            for candidate in unknown:
+                supports[candidate] = unknown_supports[candidate] + new_supports[candidate]
+
+        return supports
+
+    frequent_itemsets = []
+    updated_supports = []
+
+    # 1-itemsets: the old frequent items plus every item in the new transactions
+    candidates = [itemset for itemset in old_supports if len(itemset) == 1]
+    candidates += [frozenset([item]) for item in new_bitmaps if frozenset([item]) not in old_supports]
+    k = 1
+
+    while True:
+        supports = update(candidates)
+        large_k = [itemset for itemset in candidates if itemset in supports and supports[itemset] >= min_sup]
+
+        frequent_itemsets.append(large_k)
+        updated_supports.append(frequent_support(supports, large_k))
+        if len(large_k) == 0:
+            break
+
+        k += 1
+        candidates = join(large_k, k)
+
+    return frequent_itemsets, updated_supports
+
+
+def apriori(transactions, min_abs_sup, counting="scan", mode="all", num_shards=None, processes=None, progress=None):
     """ Main apriori algorithm """
+    # progress, if given, is called with k and the number of candidates counted once each level is done
+    if counting not in ("scan", "bitmap", "hash_tree"):
+        raise ValueError("Unknown support counting method: " + str(counting))
+
+    # with num_shards, the transactions are split into shards mined SON-style in a pool of processes
+    # (the shards are mined and counted over TID bitmaps whatever the counting method)
+    if num_shards is not None:
+        if mode != "all":
+            raise ValueError("Partitioned mining only supports mode 'all', not: " + str(mode))
+        return partitioned_apriori(shard_transactions(transactions, num_shards), min_abs_sup, len(transactions),
+                                   processes)
+
+    # closed and maximal itemsets are mined depth-first over TID bitmaps, pruning redundant itemsets as they go
+    if mode == "closed":
+        with instrumentation.phase("apriori.charm"):
+            return group_by_size(charm(transactions, min_abs_sup))
+    elif mode == "maximal":
+        with instrumentation.phase("apriori.max_miner"):
+            return group_by_size(max_miner(transactions, min_abs_sup))
+    elif mode != "all":
+        raise ValueError("Unknown mining mode: " + str(mode))
+
     frequent_itemsets = []  # list of all frequent k-itemsets
     frequent_itemsets_support = []  # support for  each frequent k-item set
 
-    candidates_1 = find_1_item_sets(transactions)  # 1-itemsets
-    print("k = 1 candidates:", len(candidates_1))
-    support_1 = scan(transactions, candidates_1)  # 1-item support counts
-    large_1 = discard(support_1, min_abs_sup)  # discard unsupported sets
+    # vertical TID bitmaps are built in one pass over the transactions, then reused for every level
+    bitmaps = None
+    if counting == "bitmap":
+        with instrumentation.phase("apriori.support_counting"):
+            bitmaps = item_bitmaps(transactions)
+    itemset_bitmaps = None  # bitmaps of the previous level's candidates
+
+    def count(candidates):
+        nonlocal itemset_bitmaps
+        instrumentation.count("apriori.candidates", len(candidates))
+        with instrumentation.phase("apriori.support_counting"):
+            if counting == "bitmap":
+                support_counts, itemset_bitmaps = scan_bitmaps(bitmaps, candidates, itemset_bitmaps)
+                return support_counts
+            elif counting == "hash_tree":
+                return scan_hash_tree(transactions, candidates)
+            return scan(transactions, candidates)
+
+    def prune(support_counts):
+        # the frequent candidates and their supports
+        with instrumentation.phase("apriori.pruning"):
+            frequent = discard(support_counts, min_abs_sup)  # discard unsupported candidates
+            return frequent, frequent_support(support_counts, frequent)
+
+    with instrumentation.phase("apriori.candidate_generation"):
+        candidates_1 = find_1_item_sets(transactions)  # 1-itemsets
+    support_1 = count(candidates_1)  # 1-item support counts
+    large_1, large_1_support = prune(support_1)  # discard unsupported sets
 
     frequent_itemsets.append(large_1)  # first set of supported itemsets
-    frequent_itemsets_support.append(scan(transactions, large_1))  # support for large_1
+    frequent_itemsets_support.append(large_1_support)  # support for large_1
 
-    print("k = 1 generated\n")
+    if progress is not None:
+        progress(1, len(candidates_1))
 
     k = 2
 
     # while the last itemsets have supporting subsets
     while len(frequent_itemsets[-1]) > 0:
-        candidates_k = join(frequent_itemsets[k - 2], k)  # new candidates created from the last frequent item sets
-        print("k =", k, "candidates:", len(candidates_k))
-        support_k = scan(transactions, candidates_k)  # count the support
-        large_k = discard(support_k, min_abs_sup)  # discard unsupported candidates
+        with instrumentation.phase("apriori.candidate_generation"):
+            candidates_k = join(frequent_itemsets[k - 2], k)  # new candidates created from the last frequent item sets
+        support_k = count(candidates_k)  # count the support
+        large_k, large_k_support = prune(support_k)  # discard unsupported candidates
 
         frequent_itemsets.append(large_k)  # store k-th set of frequent itemsets
-        frequent_itemsets_support.append(scan(transactions, large_k))  # support for large_k
+        frequent_itemsets_support.append(large_k_support)  # support for large_k
 
-        print("k =", k, "generated\n")
+        if progress is not None:
+            progress(k, len(candidates_k))
 
         k += 1
 
     return frequent_itemsets, frequent_itemsets_support
 
 
-csv_file = csv.DictReader(open('Data Mining - Spring 2017.csv'))
+PROGRAMMING_LANGUAGES_COLUMN = 'Which programming languages do you know?'
+PROGRAMMING_LANGUAGES_DELIMITERS = [";", ",", " "]
+
 
-# cleaned_data = [['A','C','D'], ['B','C'], ['A','B','C','E'], ['B','E']]  # example data from the slides
+def main(file_name=data_mining_utilities.SURVEY_FILE, column=PROGRAMMING_LANGUAGES_COLUMN,
+         delimiters=PROGRAMMING_LANGUAGES_DELIMITERS, min_rel_sup=0.2, counting="scan", mode="all",
+         cache_dir=data_mining_utilities.CACHE_DIRECTORY, num_shards=None, processes=None):
+    """ Print the frequent itemsets of a delimited survey column """
+    # cleaned_data = [['A','C','D'], ['B','C'], ['A','B','C','E'], ['B','E']]  # example data from the slides
 
-#data = load_attribute(csv_file, 'Which of these games have you played?')
-#cleaned_data = pre_processing_2.clean_data_nominal_delimited(data, [";"])
+    # column='Which of these games have you played?' with delimiters [";"] mines the games column instead
+
+    cleaned_data = load_transactions(file_name, column, delimiters, cache_dir)
+
+    min_sup = round(len(cleaned_data) * min_rel_sup)  # relative minimum support
+    print("Minimum support =", min_sup, "\n")
+
+    def show_progress(k, num_candidates):
+        print("k =", k, "candidates:", num_candidates)
+        print("k =", k, "generated\n")
 
-data = load_attribute(csv_file, 'Which programming languages do you know?')
-cleaned_data = data_mining_utilities.clean_data_nominal_delimited(data, [";", ",", " "])
+    freq_items, freq_items_support = apriori(cleaned_data, min_sup, counting, mode, num_shards, processes,
+                                             show_progress)
+    formatted = format_output(freq_items)
 
-min_sup = round(len(cleaned_data) * 0.2)  # relative minimum support
-print("Minimum support =", min_sup, "\n")
+    print("Results:\n")
+    for key, value in formatted.items():
+        print(key, value, "\n")
 
-freq_items, freq_items_support = apriori(cleaned_data, min_sup)
-formatted = format_output(freq_items)
 
-print("Results:\n")
-for key, value in formatted.items():
-    print(key, value, "\n")
+if __name__ == '__main__':
+    main()
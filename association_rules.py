@@ -0,0 +1,91 @@
+import collections
+
+Rule = collections.namedtuple('Rule', ['antecedent', 'consequent', 'support', 'confidence', 'lift', 'leverage'])
+
+
+def merge_supports(frequent_itemsets_support):
+    """ Combine the per-k support dictionaries returned by apriori() into one itemset -> support count lookup """
+    supports = {}
+    for support_k in frequent_itemsets_support:
+        supports.update(support_k)
+    return supports
+
+
+def join_consequents(consequents, m):
+    """ Generate (m + 1)-item consequents from m-item consequents sharing their first m - 1 items """
+    prefix_groups = collections.defaultdict(lambda: list())
+    for consequent in sorted(consequents):
+        prefix_groups[consequent[:-1]].append(consequent[-1])
+
+    new_consequents = []
+    for prefix, last_items in prefix_groups.items():
+        for i in range(len(last_items)):
+            for j in range(i + 1, len(last_items)):
+                new_consequents.append(prefix + (last_items[i], last_items[j]))
+
+    return new_consequents
+
+
+def rules_from_itemset(itemset, supports, num_transactions, min_confidence, min_lift, min_leverage):
+    """ Generate the rules X -> Y with X u Y = itemset, growing the consequents level by level """
+    rules = []
+    itemset_support = supports[itemset]
+    relative_support = itemset_support / num_transactions
+
+    consequents = [(item,) for item in sorted(itemset)]  # start with 1-item consequents
+    m = 1
+
+    while consequents and m < len(itemset):
+        confident_consequents = []
+
+        for consequent_items in consequents:
+            consequent = frozenset(consequent_items)
+            antecedent = itemset - consequent
+
+            # every subset of a frequent itemset is frequent, so both supports are already known
+            confidence = itemset_support / supports[antecedent]
+            if confidence < min_confidence:
+                continue
+
+            # confidence can only fall as items move from the antecedent to the consequent,
+            # so only consequents of confident rules are grown
+            confident_consequents.append(consequent_items)
+
+            consequent_relative_support = supports[consequent] / num_transactions
+            antecedent_relative_support = supports[antecedent] / num_transactions
+            lift = confidence / consequent_relative_support
+            leverage = relative_support - antecedent_relative_support * consequent_relative_support
+
+            # lift and leverage aren't anti-monotone, they filter the output but not the search
+            if (min_lift is None or lift >= min_lift) and (min_leverage is None or leverage >= min_leverage):
+                rules.append(Rule(antecedent, consequent, relative_support, confidence, lift, leverage))
+
+        consequents = join_consequents(confident_consequents, m)
+        m += 1
+
+    return rules
+
+
+def association_rules(frequent_itemsets_support, num_transactions, min_confidence=0.0, min_lift=None,
+                      min_leverage=None):
+    """ Generate association rules from the cached supports of apriori(), without rescanning the transactions """
+    supports = merge_supports(frequent_itemsets_support)
+
+    rules = []
+    for itemset in supports:
+        if len(itemset) > 1:  # a rule needs a non-empty antecedent and consequent
+            rules += rules_from_itemset(itemset, supports, num_transactions, min_confidence, min_lift, min_leverage)
+
+    # most confident rules first
+    rules.sort(key=lambda rule: (-rule.confidence, -rule.lift, sorted(rule.antecedent), sorted(rule.consequent)))
+    return rules
+
+
+def format_rules(rules):
+    """ Verbose output of the rules """
+    formatted = []
+    for rule in rules:
+        formatted.append("{} -> {} (support = {:.3f}, confidence = {:.3f}, lift = {:.3f}, leverage = {:.3f})".format(
+            sorted(rule.antecedent), sorted(rule.consequent), rule.support, rule.confidence, rule.lift,
+            rule.leverage))
+    return formatted
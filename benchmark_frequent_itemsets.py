@@ -0,0 +1,49 @@
+import data_mining_utilities
+import apriori
+import fp_growth
+import instrumentation
+
+# survey columns and the delimiters used to split them into transactions
+COLUMNS = [
+    ('Which programming languages do you know?', [";", ",", " "]),
+    ('Which of these games have you played?', [";"]),
+]
+RELATIVE_SUPPORTS = [0.4, 0.3, 0.2, 0.1, 0.05]
+REPEATS = 3
+
+
+def time_miner(miner, transactions, min_sup):
+    """ Best wall time of a few runs of a miner """
+    return instrumentation.best_time(lambda: miner(transactions, min_sup), REPEATS)
+
+
+def benchmark(file_name=data_mining_utilities.SURVEY_FILE):
+    """ Compare apriori against FP-Growth on the survey's nominal columns at several support levels """
+    for column, delimiters in COLUMNS:
+        data = apriori.load_attribute(file_name, column)
+        transactions = data_mining_utilities.clean_data_nominal_delimited(data, delimiters)
+
+        print(column, "(" + str(len(transactions)), "transactions)")
+        print("{:>8} {:>8} {:>10} {:>12} {:>13} {:>8}".format(
+            "support", "min_sup", "itemsets", "apriori (s)", "fp-growth (s)", "speedup"))
+
+        for relative_support in RELATIVE_SUPPORTS:
+            min_sup = max(1, round(len(transactions) * relative_support))
+
+            apriori_time, apriori_result = time_miner(apriori.apriori, transactions, min_sup)
+            fp_growth_time, fp_growth_result = time_miner(fp_growth.fp_growth, transactions, min_sup)
+
+            # both miners must find the same itemsets
+            if apriori.format_output(apriori_result[0]) != apriori.format_output(fp_growth_result[0]):
+                raise AssertionError("apriori and FP-Growth disagree at min_sup = " + str(min_sup))
+
+            num_itemsets = sum(len(level) for level in fp_growth_result[0])
+            print("{:>8} {:>8} {:>10} {:>12.5f} {:>13.5f} {:>7.1f}x".format(
+                relative_support, min_sup, num_itemsets, apriori_time, fp_growth_time,
+                apriori_time / fp_growth_time))
+
+        print()
+
+
+if __name__ == '__main__':
+    benchmark()
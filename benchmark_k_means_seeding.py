@@ -0,0 +1,57 @@
+import random
+import time
+
+import numpy as np
+
+import data_mining_utilities
+import k_means
+import synthetic_data
+
+NUM_BLOBS = 10
+POINTS_PER_BLOB = 1000
+KS = [5, 10, 20]
+SEEDS = range(5)
+
+
+def run_seeding(vectors, points, k, method, seed):
+    """ Seed and run k-means once, returns the seeding time, iterations to converge and cluster quality """
+    start = time.perf_counter()
+    centroids = k_means.initial_centroids(vectors, k, random.Random(seed), method)
+    seeding_time = time.perf_counter() - start
+
+    centroid_matrix = data_mining_utilities.as_float_array(list(centroids.values()))
+    labels = k_means.full_assignment(points, centroid_matrix, np.arange(k))[0]
+    centroids, labels, clusters, statistics = k_means.lloyd(points, centroid_matrix, labels)
+
+    quality = k_means.cluster_quality_array(points, centroids, labels, clusters)
+    return seeding_time, statistics["iterations"], quality
+
+
+def benchmark():
+    """ Iterations to converge and cluster quality of each seeding method, averaged over several seeds """
+    datasets = [
+        ("survey (normalised age, shoe size, height)",
+         k_means.load_normalised_vectors(data_mining_utilities.SURVEY_FILE)),
+        ("gaussian blobs (" + str(NUM_BLOBS) + " x " + str(POINTS_PER_BLOB) + ")",
+         synthetic_data.gaussian_blobs(NUM_BLOBS, POINTS_PER_BLOB)),
+    ]
+
+    for name, vectors in datasets:
+        points = data_mining_utilities.as_float_array(vectors)
+        print(name)
+        print("{:>4} {:>10} {:>12} {:>11} {:>10}".format("k", "seeding", "seeding (s)", "iterations", "quality"))
+
+        for k in KS:
+            if k > len(vectors):
+                continue
+            for method in k_means.SEEDING_METHODS:
+                results = np.array([run_seeding(vectors, points, k, method, seed) for seed in SEEDS])
+                seeding_time, iterations, quality = results.mean(axis=0)
+                print("{:>4} {:>10} {:>12.5f} {:>11.1f} {:>10.5f}".format(k, method, seeding_time, iterations,
+                                                                        quality))
+
+        print()
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,127 @@
+import math
+import re
+
+import numpy as np
+
+import data_mining_utilities
+import instrumentation
+
+FILE_NAME = data_mining_utilities.SURVEY_FILE
+NUMERIC_COLUMNS = ['Age', 'Shoe Size', 'Height']
+NOMINAL_COLUMNS = [
+    ('Which programming languages do you know?', [";", ",", " "]),
+    ('Which of these games have you played?', [";"]),
+]
+REPLICATION = 2000  # the survey is tiny, repeat its rows to get timings worth comparing
+REPEATS = 3
+
+
+# the original list-based implementations, kept as the reference for parity and speedup
+
+def reference_min_max_normalise(numbers, new_min, new_max):
+    min_number = min(numbers)
+    max_number = max(numbers)
+
+    normalised = numbers.copy()
+
+    for index, number in enumerate(normalised):
+        normalised[index] = ((number - min_number) / (max_number - min_number)) * (new_max - new_min) + new_min
+
+    return normalised
+
+
+def reference_clean_data_nominal_delimited(data, delimiters_list):
+    delimiters = ""
+    for delimiter in delimiters_list:
+        delimiters += delimiter + "|"
+
+    delimiters = delimiters[:-1]
+    p = re.compile(delimiters)
+
+    cleaned_attribute = []
+    for row in data:
+        split = p.split(row)
+
+        cleaned_row = []
+        for item in split:
+            if item != "":
+                item = item.strip()
+
+                cleaned_string = ""
+                for char in item:
+                    if char.isalpha():
+                        char = char.lower()
+                    cleaned_string += char
+
+                cleaned_row.append(cleaned_string)
+
+        cleaned_attribute.append(cleaned_row)
+
+    return cleaned_attribute
+
+
+def reference_trimmed_mean(numbers, percentage_trimmed):
+    sorted_numbers = numbers.copy()
+    sorted_numbers.sort()
+
+    num_to_trim = math.floor(len(sorted_numbers) * percentage_trimmed)
+
+    sorted_numbers = sorted_numbers[num_to_trim: - 1 * num_to_trim]
+
+    if len(sorted_numbers) > 0:
+        return data_mining_utilities.mean(sorted_numbers)
+    else:
+        return data_mining_utilities.mean(numbers)
+
+
+def best_time(function, *arguments):
+    """ Best wall time of a few calls of a function, and its result """
+    return instrumentation.best_time(lambda: function(*arguments), REPEATS)
+
+
+def report(name, reference_time, new_time):
+    print("{:<60} {:>12.5f} {:>12.5f} {:>8.1f}x".format(name, reference_time, new_time, reference_time / new_time))
+
+
+def benchmark():
+    """ Check the vectorised preprocessing matches the original implementations, and time both """
+    numeric, _ = data_mining_utilities.load_columns(FILE_NAME, NUMERIC_COLUMNS)
+    nominal, _ = data_mining_utilities.load_columns(FILE_NAME, nominal_columns={column: None
+                                                                                for column, _ in NOMINAL_COLUMNS})
+
+    print(len(numeric[NUMERIC_COLUMNS[0]]) * REPLICATION, "numeric rows,",
+          len(nominal[NOMINAL_COLUMNS[0][0]]) * REPLICATION, "nominal rows")
+    print("{:<60} {:>12} {:>12} {:>9}".format("", "original (s)", "new (s)", "speedup"))
+
+    for column in NUMERIC_COLUMNS:
+        values = np.tile(numeric[column], REPLICATION)
+        values_list = values.tolist()
+
+        reference_time, expected = best_time(reference_min_max_normalise, values_list, -1, 1)
+        new_time, normalised = best_time(data_mining_utilities.min_max_normalise, values, -1, 1)
+        if not np.array_equal(normalised, expected):
+            raise AssertionError("min_max_normalise differs on " + column)
+        report("min_max_normalise: " + column, reference_time, new_time)
+
+        buffer = np.empty_like(values)
+        buffered_time, _ = best_time(data_mining_utilities.min_max_normalise, values, -1, 1, buffer)
+        report("min_max_normalise (preallocated buffer): " + column, reference_time, buffered_time)
+
+        reference_time, expected = best_time(reference_trimmed_mean, values_list, 0.1)
+        new_time, trimmed = best_time(data_mining_utilities.trimmed_mean, values, 0.1)
+        if not math.isclose(trimmed, expected, rel_tol=1e-12):
+            raise AssertionError("trimmed_mean differs on " + column)
+        report("trimmed_mean: " + column, reference_time, new_time)
+
+    for column, delimiters in NOMINAL_COLUMNS:
+        data = list(nominal[column]) * REPLICATION
+
+        reference_time, expected = best_time(reference_clean_data_nominal_delimited, data, delimiters)
+        new_time, cleaned = best_time(data_mining_utilities.clean_data_nominal_delimited, data, delimiters)
+        if cleaned != expected:
+            raise AssertionError("clean_data_nominal_delimited differs on " + column)
+        report("clean_data_nominal_delimited: " + column[:30], reference_time, new_time)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,269 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy as np
+
+import apriori
+import fp_growth
+import instrumentation
+import k_means
+import kNN
+import mini_batch_k_means
+import synthetic_data
+
+RESULTS_DIRECTORY = 'benchmark_results'
+REPEATS = 3
+
+# each sweep varies one parameter around the base configuration, in order of increasing cost
+SCALES = {
+    "quick": {
+        "time_budget": 5.0,  # seconds, once a run takes longer the rest of its sweep is skipped
+        "k_means": {"base": {"n": 5000, "dimensions": 4, "k": 8},
+                    "sweeps": {"n": [1000, 5000, 20000], "dimensions": [2, 4, 16], "k": [4, 8, 32]},
+                    "blobs": 8, "spread": 3.0, "max_iterations": 50},
+        "kNN": {"base": {"n": 5000, "dimensions": 4, "k": 5},
+                "sweeps": {"n": [1000, 5000, 20000], "dimensions": [2, 4, 16], "k": [1, 5, 25]},
+                "blobs": 10, "spread": 3.0, "test_vectors": 500},
+        "apriori": {"base": {"n": 1000, "support": 0.02},
+                    "sweeps": {"n": [250, 1000, 4000], "support": [0.03, 0.02, 0.01]},
+                    "items": 200, "patterns": 400},
+    },
+    "full": {
+        "time_budget": 600.0,
+        "k_means": {"base": {"n": 100000, "dimensions": 8, "k": 16},
+                    "sweeps": {"n": [10000, 100000, 1000000], "dimensions": [2, 8, 32, 128],
+                               "k": [4, 16, 64, 256]},
+                    "blobs": 16, "spread": 3.0, "max_iterations": 100},
+        "kNN": {"base": {"n": 100000, "dimensions": 8, "k": 15},
+                "sweeps": {"n": [10000, 100000, 1000000], "dimensions": [2, 8, 32, 128], "k": [1, 15, 100]},
+                "blobs": 10, "spread": 3.0, "test_vectors": 2000},
+        "apriori": {"base": {"n": 100000, "support": 0.01},
+                    "sweeps": {"n": [10000, 100000, 1000000], "support": [0.02, 0.01, 0.005, 0.0025]},
+                    "items": 1000, "patterns": 2000},  # T10I4D100K at the base point
+    },
+}
+
+
+# k-means: Lloyd and Hamerly iterations from the same k-means++ seeding, and mini-batch k-means
+
+def k_means_data(parameters, settings):
+    points, _ = synthetic_data.gaussian_blob_points(settings["blobs"], -(-parameters["n"] // settings["blobs"]),
+                                                    parameters["dimensions"], spread=settings["spread"])
+    points = points[:parameters["n"]]
+    seeds = k_means.k_means_plus_plus(points, parameters["k"], np.random.RandomState(0))
+    return points, points[seeds]
+
+
+def k_means_functions(settings):
+    def lloyd(assignment):
+        def run(data, parameters):
+            points, starting_centroids = data
+            labels = k_means.full_assignment(points, starting_centroids, np.arange(parameters["k"]))[0]
+            centroids, labels, clusters, statistics = k_means.lloyd(points, starting_centroids, labels,
+                                                                    max_iterations=settings["max_iterations"],
+                                                                    assignment=assignment)
+            return {"iterations": statistics["iterations"],
+                    "quality": float(k_means.cluster_quality_array(points, centroids, labels, clusters))}
+        return run
+
+    def mini_batch(data, parameters):
+        model = mini_batch_k_means.MiniBatchKMeans(parameters["k"], batch_size=1000,
+                                                   max_iterations=settings["max_iterations"], seed=0)
+        model.fit(data[0])
+        return {}
+
+    return [("lloyd", lloyd("lloyd")), ("hamerly", lloyd("hamerly")), ("mini_batch", mini_batch)]
+
+
+# kNN: batched brute force and k-d tree classifiers, and the per-vector accuracy sweep used for the survey
+
+def knn_data(parameters, settings):
+    total = parameters["n"] + settings["test_vectors"]
+    vectors = synthetic_data.labelled_gaussian_blobs(settings["blobs"], -(-total // settings["blobs"]),
+                                                     parameters["dimensions"],
+                                                     spread=settings["spread"])[:total]
+    return vectors[:parameters["n"]], vectors[parameters["n"]:]
+
+
+def knn_functions(settings):
+    def classifier(method):
+        def run(data, parameters):
+            training_data, test_data = data
+            model = kNN.KNNClassifier(parameters["k"], method=method).fit(training_data)
+            return {"accuracy": float(model.accuracy(test_data))}
+        return run
+
+    def accuracy_sweep(data, parameters):
+        training_data, test_data = data
+        accuracies = kNN.accuracy_sweep(training_data, test_data, parameters["k"], parameters["k"])
+        return {"accuracy": accuracies[parameters["k"]]}
+
+    return [("brute", classifier("brute")), ("kd_tree", classifier("kd_tree")), ("accuracy_sweep", accuracy_sweep)]
+
+
+# frequent itemsets: apriori with each support counting method, closed itemsets and FP-Growth
+
+def apriori_data(parameters, settings):
+    return synthetic_data.quest_transactions(parameters["n"], settings["items"], num_patterns=settings["patterns"])
+
+
+def apriori_functions(settings):
+    def itemset_summary(result):
+        frequent_itemsets = result[0]
+        return {"itemsets": sum(len(level) for level in frequent_itemsets),
+                "largest": max((k + 1 for k, level in enumerate(frequent_itemsets) if level), default=0)}
+
+    def miner(function, **options):
+        def run(transactions, parameters):
+            min_sup = max(1, round(len(transactions) * parameters["support"]))
+            return itemset_summary(function(transactions, min_sup, **options))
+        return run
+
+    return [("apriori (scan)", miner(apriori.apriori, counting="scan")),
+            ("apriori (bitmap)", miner(apriori.apriori, counting="bitmap")),
+            ("apriori (hash_tree)", miner(apriori.apriori, counting="hash_tree")),
+            ("apriori (closed)", miner(apriori.apriori, mode="closed")),
+            ("fp_growth", miner(fp_growth.fp_growth))]
+
+
+# name, the parameters the data depends on, data generator and the functions timed on it
+BENCHMARKS = [
+    ("k_means", ("n", "dimensions", "k"), k_means_data, k_means_functions),
+    ("kNN", ("n", "dimensions"), knn_data, knn_functions),
+    ("apriori", ("n",), apriori_data, apriori_functions),
+]
+
+
+def sweep_points(settings):
+    """ Parameter points of a benchmark, sweep by sweep (the base point appears in every sweep) """
+    for parameter, values in settings["sweeps"].items():
+        for value in values:
+            point = dict(settings["base"])
+            point[parameter] = value
+            yield parameter, point
+
+
+def run_benchmark(name, data_parameters, make_data, make_functions, settings, time_budget, repeats, profile):
+    """ Time every function over the sweeps of one benchmark, returns a list of result records """
+    functions = make_functions(settings)
+    data_cache = {}  # the data is generated once for all of the functions and sweeps that use it
+    records = {}  # (function, point) -> record, so the base point is only timed once
+    over_budget = set()  # (function, sweep) pairs whose remaining points are skipped
+
+    for parameter, point in sweep_points(settings):
+        point_key = tuple(sorted(point.items()))
+        for function_name, function in functions:
+            if (function_name, point_key) in records:
+                continue
+            if (function_name, parameter) in over_budget:
+                print("{:<8} {:<20} {:<40} skipped (over the time budget)".format(name, function_name, str(point)))
+                continue
+
+            data_key = tuple(point[parameter] for parameter in data_parameters)
+            if data_key not in data_cache:
+                data_cache[data_key] = make_data(point, settings)
+            data = data_cache[data_key]
+
+            seconds, summary = instrumentation.best_time(lambda: function(data, point), repeats, time_budget)
+            record = {"benchmark": name, "function": function_name, "parameters": point, "seconds": seconds,
+                      "summary": summary}
+
+            if profile:
+                # a separate run, tracing memory slows the phases down
+                instrumentation.enable()
+                function(data, point)
+                record["phases"] = instrumentation.disable().as_dict()
+
+            records[(function_name, point_key)] = record
+            print("{:<8} {:<20} {:<40} {:>10.4f}s {}".format(name, function_name, str(point), seconds, summary))
+
+            if seconds > time_budget:
+                over_budget.add((function_name, parameter))
+
+    return list(records.values())
+
+
+def git_commit():
+    """ Short hash of the checked out commit, or None outside a git checkout """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(scale="quick", only=None, repeats=REPEATS, label=None, output=None, profile=False):
+    """ Run the scaling sweeps and store the results as JSON for comparison between versions """
+    settings = SCALES[scale]
+    commit = git_commit()
+    label = label or commit or "current"
+
+    results = []
+    for name, data_parameters, make_data, make_functions in BENCHMARKS:
+        if only is None or name in only:
+            results += run_benchmark(name, data_parameters, make_data, make_functions, settings[name],
+                                     settings["time_budget"], repeats, profile)
+
+    stored = {"label": label, "commit": commit, "scale": scale,
+              "created": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+              "results": results}
+
+    if output is None:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        output = os.path.join(RESULTS_DIRECTORY, label + "-" + scale + ".json")
+    with open(output, "w") as results_file:
+        json.dump(stored, results_file, indent=2)
+    print("results written to", output)
+
+    return stored
+
+
+def compare(baseline_file, new_file):
+    """ Speedup of each function and parameter point timed in both result files """
+    with open(baseline_file) as results_file:
+        baseline = json.load(results_file)
+    with open(new_file) as results_file:
+        new = json.load(results_file)
+
+    def key(record):
+        return record["benchmark"], record["function"], tuple(sorted(record["parameters"].items()))
+
+    baseline_seconds = {key(record): record["seconds"] for record in baseline["results"]}
+
+    print("{} ({}) -> {} ({})".format(baseline["label"], baseline["scale"], new["label"], new["scale"]))
+    print("{:<8} {:<20} {:<40} {:>12} {:>12} {:>9}".format("", "", "", "baseline (s)", "new (s)", "speedup"))
+    for record in new["results"]:
+        if key(record) in baseline_seconds:
+            before = baseline_seconds[key(record)]
+            print("{:<8} {:<20} {:<40} {:>12.4f} {:>12.4f} {:>8.2f}x".format(
+                record["benchmark"], record["function"], str(record["parameters"]), before, record["seconds"],
+                before / record["seconds"]))
+
+
+def main(argv=None):
+    """ Run the sweeps, or compare two stored result files """
+    parser = argparse.ArgumentParser(description="Scaling benchmarks of k-means, kNN and apriori on synthetic data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick")
+    parser.add_argument("--only", nargs="+", choices=[benchmark[0] for benchmark in BENCHMARKS], default=None)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--label", default=None, help="name of this run (default: the git commit)")
+    parser.add_argument("--output", default=None, help="results file (default: benchmark_results/LABEL-SCALE.json)")
+    parser.add_argument("--profile", action="store_true", help="also record the instrumentation phases of each run")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "NEW"), default=None,
+                        help="compare two results files instead of running the benchmarks")
+    arguments = parser.parse_args(argv)
+
+    if arguments.compare:
+        compare(*arguments.compare)
+    else:
+        benchmark(arguments.scale, arguments.only, arguments.repeats, arguments.label, arguments.output,
+                  arguments.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import collections
+import math
+import operator
+import random
+import sys
+
+import numpy as np
+
+import data_mining_utilities
+import k_means
+
+SEEDS = [0, 1, 2, 3]
+QUALITY_TOLERANCE = 1e-9  # relative, the trimmed means are summed in a different order
+CENTROID_TOLERANCE = 1e-12
+
+
+# the original pure Python k-means, kept as the reference the array-based version must reproduce
+
+def reference_distance(vector_1, vector_2):
+    distance = 0
+    for attribute in zip(vector_1, vector_2):
+        distance += pow(attribute[0] - attribute[1], 2)
+    return math.sqrt(distance)
+
+
+def reference_mean(numbers):
+    return sum(numbers) / len(numbers)
+
+
+def reference_trimmed_mean(numbers, percentage_trimmed):
+    sorted_numbers = sorted(numbers)
+    num_to_trim = math.floor(len(sorted_numbers) * percentage_trimmed)
+    sorted_numbers = sorted_numbers[num_to_trim: - 1 * num_to_trim]
+    return reference_mean(sorted_numbers) if len(sorted_numbers) > 0 else reference_mean(numbers)
+
+
+def reference_nearest(vector, centroids):
+    distances = {cluster_id: reference_distance(vector, centroid) for cluster_id, centroid in centroids.items()}
+    return min(distances.items(), key=operator.itemgetter(1))[0]
+
+
+def reference_clusters(labelled_vectors):
+    clusters = collections.defaultdict(list)
+    for cluster_id, vector in labelled_vectors:
+        clusters[cluster_id].append(vector)
+    return clusters
+
+
+def reference_k_means(centroids, vectors, k):
+    """ Final centroids and labelled vectors of the original k-means """
+    labelled_vectors = [[reference_nearest(vector, centroids), vector] for vector in vectors]
+
+    average_centroid_movement = float("inf")
+    while average_centroid_movement > 0:
+        new_centroids = {}
+        for cluster_id, vectors_in_cluster in reference_clusters(labelled_vectors).items():
+            new_centroids[cluster_id] = [reference_trimmed_mean(list(values), 0.1)
+                                         for values in zip(*vectors_in_cluster)]
+
+        differences = [reference_distance(centroids[i], new_centroids[i]) for i in range(k) if i in new_centroids]
+        average_centroid_movement = reference_mean(differences)
+
+        centroids = new_centroids
+        labelled_vectors = [[reference_nearest(vector, centroids), vector] for _, vector in labelled_vectors]
+
+    return centroids, labelled_vectors
+
+
+def reference_quality(centroids, labelled_vectors):
+    clusters = reference_clusters(labelled_vectors)
+    variances = []
+    for cluster_id, centroid in centroids.items():
+        squared_differences = sum(pow(reference_distance(vector, centroid), 2) for vector in clusters[cluster_id])
+        variances.append(squared_differences / float(len(clusters[cluster_id])))
+    return reference_mean(variances)
+
+
+def close(value, reference, tolerance):
+    return abs(value - reference) <= tolerance * max(abs(reference), 1e-300)
+
+
+def check_seed(vectors, seed, min_k, max_k):
+    """ Mismatches between k-means (both assignment methods, and the sweep) and the reference for one seed """
+    starting_centroids = k_means.initial_centroids(vectors, max_k, random.Random(seed))
+    sweeps = {assignment: k_means.k_sweep(vectors, min_k, max_k, starting_centroids, processes=1,
+                                          assignment=assignment)
+              for assignment in ("lloyd", "hamerly")}
+
+    mismatches = []
+    for k in range(min_k, max_k + 1):
+        k_centroids = collections.OrderedDict((i, starting_centroids[i]) for i in range(k))
+        expected_centroids, expected_labelled = reference_k_means(k_centroids, vectors, k)
+        expected_quality = reference_quality(expected_centroids, expected_labelled)
+
+        for assignment in ("lloyd", "hamerly"):
+            def mismatch(what):
+                mismatches.append("seed {} k {} {}: {}".format(seed, k, assignment, what))
+
+            centroids, labelled = k_means.k_means(k_centroids, k_means.initial_clusters(vectors, k_centroids), k,
+                                                  assignment=assignment)
+            if [label for label, _ in labelled] != [label for label, _ in expected_labelled]:
+                mismatch("labels differ")
+            if sorted(centroids) != sorted(expected_centroids) or not all(
+                    np.allclose(centroids[i], expected_centroids[i], rtol=CENTROID_TOLERANCE, atol=0)
+                    for i in expected_centroids):
+                mismatch("centroids differ")
+            if not close(k_means.cluster_quality(centroids, labelled), expected_quality, QUALITY_TOLERANCE):
+                mismatch("cluster_quality differs")
+            if not close(sweeps[assignment][k], expected_quality, QUALITY_TOLERANCE):
+                mismatch("k_sweep quality differs")
+
+    return mismatches
+
+
+def main(argv=None):
+    """ Check the array-based k-means against the original implementation on the survey, exit 1 on a mismatch """
+    parser = argparse.ArgumentParser(description="Parity of k-means with the original implementation")
+    parser.add_argument("file_name", nargs="?", default=data_mining_utilities.SURVEY_FILE)
+    parser.add_argument("--seeds", type=int, nargs="+", default=SEEDS)
+    parser.add_argument("--min-k", type=int, default=1)
+    parser.add_argument("--max-k", type=int, default=None, help="default: every k up to the number of vectors")
+    arguments = parser.parse_args(argv)
+
+    vectors = k_means.load_normalised_vectors(arguments.file_name)
+    max_k = len(vectors) if arguments.max_k is None else arguments.max_k
+
+    mismatches = []
+    for seed in arguments.seeds:
+        mismatches += check_seed(vectors, seed, arguments.min_k, max_k)
+
+    for mismatch in mismatches:
+        print(mismatch)
+    print("{} seeds, k = {}..{}: {}".format(len(arguments.seeds), arguments.min_k, max_k,
+                                            "{} mismatches".format(len(mismatches)) if mismatches else "identical"))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
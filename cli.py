@@ -0,0 +1,111 @@
+import argparse
+
+import data_mining_utilities
+import instrumentation
+import kNN
+import k_means
+import apriori
+
+
+def add_common_arguments(parser):
+    """ Input file and cache options shared by every subcommand """
+    parser.add_argument("file_name", nargs="?", default=data_mining_utilities.SURVEY_FILE,
+                        help="survey CSV file (default: %(default)s)")
+    parser.add_argument("--no-cache", dest="cache_dir", action="store_const", const=None,
+                        default=data_mining_utilities.CACHE_DIRECTORY,
+                        help="clean the data from scratch rather than using the columnar cache")
+    parser.add_argument("--profile", metavar="JSON_FILE", default=None,
+                        help="record the wall time, calls and memory peak of each phase as JSON ('-' for stdout)")
+
+
+def add_k_range_arguments(parser):
+    """ Range of k to sweep, max_k defaults to the number of usable vectors """
+    parser.add_argument("--min-k", type=int, default=1)
+    parser.add_argument("--max-k", type=int, default=None)
+
+
+def run_knn(arguments):
+    """ k-NN accuracy sweep """
+    kNN.main(arguments.file_name, arguments.label, arguments.features, arguments.min_k, arguments.max_k,
+             arguments.training_fraction, cache_dir=arguments.cache_dir)
+
+
+def run_kmeans(arguments):
+    """ k-means quality sweep """
+    k_means.main(arguments.file_name, arguments.columns, arguments.min_k, arguments.max_k, arguments.seed,
+                 arguments.seeding, arguments.processes, arguments.tolerance, arguments.max_iterations,
+                 arguments.assignment, cache_dir=arguments.cache_dir)
+
+
+def run_apriori(arguments):
+    """ Frequent itemset mining """
+    apriori.main(arguments.file_name, arguments.column, arguments.delimiters, arguments.min_support,
+                 arguments.counting, arguments.mode, arguments.cache_dir, arguments.shards, arguments.processes)
+
+
+def build_parser():
+    """ Command line parser with one subcommand per algorithm """
+    parser = argparse.ArgumentParser(description="Data mining on the survey responses")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    knn_parser = subparsers.add_parser("knn", help="k-NN prediction accuracy for a range of k")
+    add_common_arguments(knn_parser)
+    add_k_range_arguments(knn_parser)
+    knn_parser.add_argument("--label", default="Gender", help="column to predict (default: %(default)s)")
+    knn_parser.add_argument("--features", nargs="+", default=list(kNN.FEATURE_COLUMNS),
+                            help="numeric feature columns (default: %(default)s)")
+    knn_parser.add_argument("--training-fraction", type=float, default=2 / 3,
+                            help="leading fraction of the rows used for training (default: 2/3)")
+    knn_parser.set_defaults(run=run_knn)
+
+    kmeans_parser = subparsers.add_parser("kmeans", help="k-means cluster quality for a range of k")
+    add_common_arguments(kmeans_parser)
+    add_k_range_arguments(kmeans_parser)
+    kmeans_parser.add_argument("--columns", nargs="+", default=list(k_means.ATTRIBUTE_COLUMNS),
+                               help="numeric columns to cluster (default: %(default)s)")
+    kmeans_parser.add_argument("--seed", type=int, default=None)
+    kmeans_parser.add_argument("--seeding", choices=k_means.SEEDING_METHODS, default="random")
+    kmeans_parser.add_argument("--assignment", choices=("lloyd", "hamerly"), default="lloyd")
+    kmeans_parser.add_argument("--tolerance", type=float, default=0.0)
+    kmeans_parser.add_argument("--max-iterations", type=int, default=None)
+    kmeans_parser.add_argument("--processes", type=int, default=None,
+                               help="worker processes for the sweep (default: one per CPU)")
+    kmeans_parser.set_defaults(run=run_kmeans)
+
+    apriori_parser = subparsers.add_parser("apriori", help="frequent itemsets of a delimited column")
+    add_common_arguments(apriori_parser)
+    apriori_parser.add_argument("--column", default=apriori.PROGRAMMING_LANGUAGES_COLUMN,
+                                help="delimited column to mine (default: %(default)s)")
+    apriori_parser.add_argument("--delimiters", nargs="+", default=apriori.PROGRAMMING_LANGUAGES_DELIMITERS,
+                                help="delimiters between the items of a transaction (default: %(default)s)")
+    apriori_parser.add_argument("--min-support", type=float, default=0.2,
+                                help="relative minimum support (default: %(default)s)")
+    apriori_parser.add_argument("--counting", choices=("scan", "bitmap", "hash_tree"), default="scan")
+    apriori_parser.add_argument("--mode", choices=("all", "closed", "maximal"), default="all")
+    apriori_parser.add_argument("--shards", type=int, default=None,
+                                help="mine this many shards of the transactions in parallel (SON), mode 'all' only")
+    apriori_parser.add_argument("--processes", type=int, default=None,
+                                help="worker processes for the shards (default: one per CPU)")
+    apriori_parser.set_defaults(run=run_apriori)
+
+    return parser
+
+
+def main(argv=None):
+    """ Run the subcommand given on the command line """
+    arguments = build_parser().parse_args(argv)
+    if arguments.profile is None:
+        arguments.run(arguments)
+        return
+
+    instrumentation.enable()
+    try:
+        with instrumentation.phase("total"):
+            arguments.run(arguments)
+    finally:
+        instrumentation.write_json(instrumentation.disable(), arguments.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,25 @@
 import collections
+import csv
+import hashlib
+import itertools
+import json
+import os
 import re
 import math
+import multiprocessing
+import shutil
+import tempfile
+
+import numpy as np
+
+import instrumentation
+
+SURVEY_FILE = 'Data Mining - Spring 2017.csv'  # the bundled survey responses
+DISTANCE_BLOCK_SIZE = 1024  # rows of the left-hand matrix processed per block in pairwise_distances
+ROUNDING_MARGIN = 1e-9  # relative to the squared norms, covers the rounding of the matrix product form of distances
+CSV_CHUNK_SIZE = 10000  # rows parsed at a time by the CSV loader
+CACHE_DIRECTORY = '.cache'  # default location of the columnar cache of cleaned data
+CACHE_VERSION = 2  # bump whenever the cache layout or the loading/cleaning code changes, stale entries are never read
 
 
 def histogram_nominal(values):
@@ -10,48 +29,40 @@ def histogram_nominal(values):
     return frequencies
 
 
-def min_max_normalise(numbers, new_min, new_max):
-    min_number = min(numbers)
-    max_number = max(numbers)
+def min_max_normalise(numbers, new_min, new_max, out=None):
+    """ Rescale numbers to [new_min, new_max] as a float array, into 'out' if given (which may be 'numbers') """
+    with instrumentation.phase("normalise"):
+        numbers = np.asarray(numbers, dtype=np.float64)
+        min_number = numbers.min()
+        max_number = numbers.max()
+        if max_number == min_number:
+            # a constant column has no range to rescale, the division would fill it with NaN
+            raise ZeroDivisionError("min/max normalisation of a constant set of numbers (every value is " +
+                                    str(min_number) + ")")
 
-    normalised = numbers.copy()
+        if out is None:
+            out = np.empty_like(numbers)
 
-    for index, number in enumerate(normalised):
-        normalised[index] = ((number - min_number) / (max_number - min_number)) * (new_max - new_min) + new_min
+        # same order of operations as ((number - min) / (max - min)) * (new_max - new_min) + new_min
+        np.subtract(numbers, min_number, out=out)
+        out /= (max_number - min_number)
+        out *= (new_max - new_min)
+        out += new_min
 
-    return normalised
+    return out
 
 
-def clean_data_nominal_delimited(data, delimiters_list):
+def _delimiter_pattern(delimiters_list):
     # construct the regex from the list of delimiters
-    delimiters = ""
-    for delimiter in delimiters_list:
-        delimiters += delimiter + "|"
-
-    delimiters = delimiters[:-1]  # remove the trailing pipe
-    p = re.compile(delimiters)
-
-    cleaned_attribute = []
-    for row in data:
-        split = p.split(row)
+    return re.compile("|".join(delimiters_list))
 
-        cleaned_row = []
-        for item in split:
-            if item != "":  # ignore empty strings created by the splitting
-                item = item.strip()  # strip leading/trailing whitespace
 
-                # convert alphabetical characters to lower case
-                cleaned_string = ""
-                for char in item:
-                    if char.isalpha():
-                        char = char.lower()
-                    cleaned_string += char
-
-                cleaned_row.append(cleaned_string)
-
-        cleaned_attribute.append(cleaned_row)
+def clean_data_nominal_delimited(data, delimiters_list):
+    p = _delimiter_pattern(delimiters_list)
 
-    return cleaned_attribute
+    # ignore empty strings created by the splitting, strip leading/trailing whitespace and convert to lower case
+    with instrumentation.phase("clean"):
+        return [[item.strip().lower() for item in p.split(row) if item != ""] for row in data]
 
 
 def mean(numbers):
@@ -59,39 +70,406 @@ def mean(numbers):
 
 
 def trimmed_mean(numbers, percentage_trimmed):
-    sorted_numbers = numbers.copy()
-    sorted_numbers.sort()
+    return float(trimmed_mean_columns(numbers, percentage_trimmed))
+
+
+def trimmed_mean_columns(matrix, percentage_trimmed):
+    """ Trimmed mean of a 1-D array, or of every column of a 2-D array, using partial selection not a full sort """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    num_values = matrix.shape[0]
 
     # convert relative trim to absolute trim
-    num_to_trim = math.floor(len(sorted_numbers) * percentage_trimmed)
+    num_to_trim = math.floor(num_values * percentage_trimmed)
 
-    # discard values from the start and end of the set of values
-    sorted_numbers = sorted_numbers[num_to_trim: - 1 * num_to_trim]
+    if num_to_trim == 0 or num_values - 2 * num_to_trim <= 0:
+        # nothing was trimmed, or all values were trimmed: the mean of the untrimmed set of values
+        return matrix.mean(axis=0)
 
-    if len(sorted_numbers) > 0:
-        return mean(sorted_numbers)
-    else:
-        # all values were trimmed, return the mean of the untrimmed set of values
-        return mean(numbers)
+    # discard values from the start and end of the set of values,
+    # only the trimmed values need to be separated from the rest, the middle doesn't need to be ordered
+    partitioned = np.partition(matrix, [num_to_trim - 1, num_values - num_to_trim], axis=0)
+    return partitioned[num_to_trim: num_values - num_to_trim].mean(axis=0)
 
 
 def variance(vectors, mean):
-    squared_differences = 0
-    for vector in vectors:
-        difference = euclidean_distance(vector, mean)
-        try:
-            squared_differences += pow(difference, 2)
-        except TypeError as e:
-            print(e)
-    return squared_differences / float(len(vectors))
+    if len(vectors) == 0:
+        raise ZeroDivisionError("variance of an empty set of vectors")
+
+    # squared Euclidean distance from every vector to the mean in one batch
+    squared_differences = distances_to(mean, vectors, "sqeuclidean").sum()
+    return float(squared_differences) / float(len(vectors))
+
+
+def as_float_array(vectors):
+    """ Convert a vector or list of vectors into a contiguous 2-D float array """
+    array = np.ascontiguousarray(vectors, dtype=np.float64)
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    return array
+
+
+def _row_distances(differences_or_products, metric):
+    """ Reduce the last axis of the broadcast differences (or products for cosine) to distances """
+    if metric == "sqeuclidean":
+        return np.einsum("...i,...i->...", differences_or_products, differences_or_products)
+    elif metric == "euclidean":
+        return np.sqrt(np.einsum("...i,...i->...", differences_or_products, differences_or_products))
+    elif metric == "manhattan":
+        return np.abs(differences_or_products).sum(axis=-1)
+    else:
+        raise ValueError("Unknown distance metric: " + str(metric))
+
+
+def _cosine_distances(vectors_1, vectors_2):
+    norms_1 = np.sqrt(np.einsum("ij,ij->i", vectors_1, vectors_1))
+    norms_2 = np.sqrt(np.einsum("ij,ij->i", vectors_2, vectors_2))
+    denominator = np.outer(norms_1, norms_2)
+
+    # a zero vector has no direction, treat it as maximally distant from everything
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = (vectors_1 @ vectors_2.T) / denominator
+    similarity[denominator == 0] = 0.0
+
+    return 1.0 - np.clip(similarity, -1.0, 1.0)
+
+
+DISTANCE_METRICS = ("euclidean", "sqeuclidean", "manhattan", "cosine")
+
+
+def pairwise_distances(vectors_1, vectors_2, metric="euclidean", out=None, exact=False):
+    """ Many-to-many distances, returns an array of shape (len(vectors_1), len(vectors_2)) """
+    # exact=True takes the differences rather than the matrix product for euclidean distances, which is slower
+    # but rounds the same way as distances_to, so exactly equal distances stay equal (e.g. for ties in argmin)
+    if metric not in DISTANCE_METRICS:
+        raise ValueError("Unknown distance metric: " + str(metric))
+
+    vectors_1 = as_float_array(vectors_1)
+    vectors_2 = as_float_array(vectors_2)
+    if vectors_1.shape[1] != vectors_2.shape[1]:
+        raise ValueError("vectors are different lengths")
+
+    if out is None:
+        out = np.empty((vectors_1.shape[0], vectors_2.shape[0]), dtype=np.float64)
+
+    if metric == "cosine":
+        out[:] = _cosine_distances(vectors_1, vectors_2)
+        return out
+
+    if metric == "manhattan" or exact:
+        # broadcast the differences a block of each side at a time, so the temporary (rows, columns, dimensions)
+        # array stays around DISTANCE_BLOCK_SIZE^2 elements however long the vectors are
+        column_block_size = max(1, DISTANCE_BLOCK_SIZE // vectors_1.shape[1])
+        for start in range(0, vectors_1.shape[0], DISTANCE_BLOCK_SIZE):
+            block = vectors_1[start: start + DISTANCE_BLOCK_SIZE]
+            for column_start in range(0, vectors_2.shape[0], column_block_size):
+                columns = vectors_2[column_start: column_start + column_block_size]
+                differences = block[:, np.newaxis, :] - columns[np.newaxis, :, :]
+                out[start: start + block.shape[0], column_start: column_start + columns.shape[0]] = \
+                    _row_distances(differences, metric)
+        return out
+
+    # |a - b|^2 = |a|^2 - 2 a.b + |b|^2 needs no (rows, columns, dimensions) temporary at all, one block of
+    # rows at a time is a matrix product into the output (clipped at 0, rounding can take it just below)
+    squared_norms_1 = np.einsum("ij,ij->i", vectors_1, vectors_1)
+    squared_norms_2 = np.einsum("ij,ij->i", vectors_2, vectors_2)
+    for start in range(0, vectors_1.shape[0], DISTANCE_BLOCK_SIZE):
+        block = vectors_1[start: start + DISTANCE_BLOCK_SIZE]
+        distances = out[start: start + block.shape[0]]
+        if distances.flags.c_contiguous:
+            np.matmul(block, vectors_2.T, out=distances)
+        else:
+            distances[:] = block @ vectors_2.T
+        distances *= -2.0
+        distances += squared_norms_1[start: start + block.shape[0], np.newaxis]
+        distances += squared_norms_2[np.newaxis, :]
+        np.maximum(distances, 0.0, out=distances)
+        if metric == "euclidean":
+            np.sqrt(distances, out=distances)
+
+    return out
+
+
+def distances_to(vector, vectors, metric="euclidean"):
+    """ One-to-many distances from a single vector to every row of a set of vectors """
+    vector = as_float_array(vector)
+    vectors = as_float_array(vectors)
+    if vector.shape[1] != vectors.shape[1]:
+        raise ValueError("vectors are different lengths")
+    if metric == "cosine":
+        return _cosine_distances(vector, vectors)[0]
+
+    # the differences are only as large as 'vectors', so they're taken exactly rather than by the matrix product
+    return _row_distances(vectors - vector, metric)
 
 
 def euclidean_distance(vector_1, vector_2):
     if len(vector_1) != len(vector_2):
         return "Error - vectors are different lengths"
 
-    distance = 0
-    for attribute in zip(vector_1, vector_2):
-        distance += pow(attribute[0] - attribute[1], 2)
+    return float(distances_to(vector_1, vector_2)[0])
+
+
+def read_csv_chunks(file_name, columns, chunk_size=CSV_CHUNK_SIZE):
+    """ Stream the raw values of the requested columns, chunk_size rows at a time, as a dict of column -> list """
+    # file_name can also be rows already read as dicts (e.g. a csv.DictReader), as the loaders originally took
+    if not isinstance(file_name, (str, bytes, os.PathLike)):
+        yield from _row_chunks(file_name, columns, chunk_size)
+        return
+
+    with open(file_name, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise KeyError("Columns not in " + str(file_name) + ": " + str(missing))
+        positions = [header.index(column) for column in columns]
+
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+
+            # only the requested columns are kept, the rest of each row is discarded straight away
+            yield {column: [row[position] if position < len(row) else "" for row in rows]
+                   for column, position in zip(columns, positions)}
+
+
+def _row_chunks(rows, columns, chunk_size):
+    """ read_csv_chunks over an iterable of row dicts """
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        # a short row of a csv.DictReader has None for its missing fields
+        yield {column: [row[column] if row[column] is not None else "" for row in chunk] for column in columns}
+
+
+def parse_floats(values):
+    """ Parse a list of strings (decimal commas allowed) into a float array and a mask of the parsed values """
+    values = [value.replace(",", ".") for value in values]
+
+    try:  # the whole chunk at once, the common case
+        return np.array(values, dtype=np.float64), np.ones(len(values), dtype=bool)
+    except ValueError:
+        pass
+
+    # something in the chunk isn't numeric, fall back to parsing each value
+    parsed = np.full(len(values), np.nan)
+    valid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+            valid[i] = True
+        except ValueError:
+            pass
+
+    return parsed, valid
+
+
+def clean_nominal(values, cleaner):
+    """ Apply a cleaning rule (returning None to reject a value) once per distinct value of a chunk """
+    cleaned_values = {value: cleaner(value) for value in set(values)}
+    cleaned = np.array([cleaned_values[value] for value in values], dtype=object)
+    valid = np.array([cleaned_values[value] is not None for value in values], dtype=bool)
+    return cleaned, valid
+
+
+def load_columns(file_name, numeric_columns=(), nominal_columns=None, chunk_size=CSV_CHUNK_SIZE):
+    """ Load and clean columns of a CSV file in chunks, returns a dict of column -> array and the rejects per column """
+    # file_name is a CSV file or an iterable of row dicts, see read_csv_chunks
+    # numeric_columns are parsed into float arrays, nominal_columns maps a column to a cleaning rule
+    # (or None to keep the raw strings). The nominal columns come first in the result.
+    # Rows with a value that can't be parsed or cleaned are discarded and counted, not printed.
+    nominal_columns = nominal_columns or {}
+    columns = list(nominal_columns) + [column for column in numeric_columns if column not in nominal_columns]
+
+    chunks = collections.defaultdict(lambda: list())
+    rejects = collections.Counter()
+
+    raw_chunks = read_csv_chunks(file_name, columns, chunk_size)
+    while True:
+        with instrumentation.phase("load"):
+            raw_chunk = next(raw_chunks, None)
+        if raw_chunk is None:
+            break
+
+        with instrumentation.phase("clean"):
+            parsed_chunk = {}
+            keep = None
+
+            for column in columns:
+                if column in nominal_columns:
+                    cleaner = nominal_columns[column]
+                    if cleaner is None:
+                        parsed_chunk[column] = np.array(raw_chunk[column], dtype=object)
+                        continue
+                    parsed, valid = clean_nominal(raw_chunk[column], cleaner)
+                else:
+                    parsed, valid = parse_floats(raw_chunk[column])
+
+                rejects[column] += int(len(valid) - valid.sum())
+                parsed_chunk[column] = parsed
+                keep = valid if keep is None else keep & valid
+
+            # keep a row only if all of its attributes were successfully cleaned
+            for column in columns:
+                chunks[column].append(parsed_chunk[column] if keep is None else parsed_chunk[column][keep])
+
+    loaded = collections.OrderedDict()
+    for column in columns:
+        if chunks[column]:
+            loaded[column] = np.concatenate(chunks[column])
+        else:
+            loaded[column] = np.empty(0, dtype=object if column in nominal_columns else np.float64)
+
+    # the callers only keep the clean rows, the rejects still show up in profiles (e.g. cli.py --profile)
+    for column, num_rejects in rejects.items():
+        instrumentation.count("rejects: " + column, num_rejects)
+
+    return loaded, rejects
+
+
+def file_hash(file_name, block_size=1 << 20):
+    """ SHA-256 of a file's contents, read in blocks """
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(file_name, parameters):
+    """ Key of a cache entry: the source file's contents, the parameters of the cleaning and CACHE_VERSION """
+    description = json.dumps({'source': file_hash(file_name), 'parameters': parameters, 'version': CACHE_VERSION},
+                             sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _encode_items(values):
+    """ Integer-encode nominal values, returns the codes and the item dictionary (code -> item) """
+    items = {}
+    codes = np.array([items.setdefault(value, len(items)) for value in values], dtype=np.int32)
+    return codes, list(items)
+
+
+def _write_column(directory, index, name, column):
+    """ Write a column as .npy files, returns its manifest entry """
+    file_stem = 'column_' + str(index)
+
+    if isinstance(column, np.ndarray) and column.dtype != object:
+        np.save(os.path.join(directory, file_stem + '.npy'), column)
+        return {'name': name, 'kind': 'numeric', 'file': file_stem + '.npy'}
+
+    if len(column) > 0 and isinstance(column[0], (list, tuple)):
+        # delimited nominal data (e.g. transactions), stored as offsets into one flat array of item codes
+        lengths = np.array([len(row) for row in column], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        codes, items = _encode_items(itertools.chain.from_iterable(column))
+        np.save(os.path.join(directory, file_stem + '_offsets.npy'), offsets)
+        np.save(os.path.join(directory, file_stem + '.npy'), codes)
+        return {'name': name, 'kind': 'delimited', 'file': file_stem + '.npy',
+                'offsets': file_stem + '_offsets.npy', 'items': items}
+
+    codes, items = _encode_items(column)
+    np.save(os.path.join(directory, file_stem + '.npy'), codes)
+    return {'name': name, 'kind': 'nominal', 'file': file_stem + '.npy', 'items': items}
+
+
+def _read_column(directory, entry):
+    """ Memory-map a column written by _write_column """
+    data = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+
+    if entry['kind'] == 'numeric':
+        return data
+
+    items = np.empty(len(entry['items']), dtype=object)
+    items[:] = entry['items']
+    if entry['kind'] == 'nominal':
+        return items[data]
+
+    offsets = np.load(os.path.join(directory, entry['offsets']), mmap_mode='r')
+    decoded = items[data].tolist()
+    return [decoded[offsets[i]: offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def cached_columns(file_name, parameters, build, cache_dir=CACHE_DIRECTORY):
+    """ Memory-map cleaned columns from the columnar cache, or build them with build() and cache them """
+    # parameters must describe everything that changes the cleaned output (the loader, columns, delimiters,
+    # normalisation range...), together with the source file's hash and CACHE_VERSION they key the cache
+    directory = os.path.join(cache_dir, cache_key(file_name, parameters))
+    manifest_path = os.path.join(directory, 'manifest.json')
+
+    if os.path.exists(manifest_path):
+        with instrumentation.phase("cache_load"):
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            return collections.OrderedDict((entry['name'], _read_column(directory, entry)) for entry in manifest)
+
+    columns = build()
+
+    # write into a temporary directory first so a partially written entry is never read
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_directory = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        manifest = [_write_column(temporary_directory, index, name, column)
+                    for index, (name, column) in enumerate(columns.items())]
+        with open(os.path.join(temporary_directory, 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(temporary_directory, directory)
+    except OSError:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        if not os.path.exists(manifest_path):  # another run may have just written the same entry
+            raise
+
+    return columns
+
+
+_shared = {}  # the arrays (and whether to profile) of a parallel_map worker process
+
+
+def _init_shared_worker(shared_arrays, profiled):
+    """ Give a worker process array views of the shared memory, without copying it """
+    _shared["arrays"] = {name: np.frombuffer(raw, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+                         for name, (raw, dtype, shape) in shared_arrays.items()}
+    _shared["profiled"] = profiled
+
+
+def _run_shared_task(numbered_task):
+    """ Run one parallel_map task, returns its number, its result and, in a profiled worker, its profile """
+    number, (function, task) = numbered_task
+    if _shared["profiled"]:
+        instrumentation.enable()
+    result = function(_shared["arrays"], task)
+    profile = instrumentation.disable().as_dict() if _shared["profiled"] else None
+    return number, result, profile
+
+
+def parallel_map(function, tasks, arrays, processes=None):
+    """ [function(arrays, task) for task in tasks] across a process pool, with the arrays in shared memory """
+    # function must be a module-level function and arrays a dict of name -> numpy array. The arrays are copied
+    # into shared memory once rather than pickled with every task, tasks are handed out in the order given
+    # (so put the slowest first) and worker processes profile their own tasks into this process's profile
+    shared_arrays = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        raw = multiprocessing.RawArray("b", max(array.nbytes, 1))
+        np.frombuffer(raw, dtype=array.dtype, count=array.size)[:] = array.ravel()
+        shared_arrays[name] = (raw, array.dtype, array.shape)
+
+    numbered_tasks = list(enumerate((function, task) for task in tasks))
+    if processes == 1:
+        _init_shared_worker(shared_arrays, False)  # profiled directly into this process's profile
+        runs = list(map(_run_shared_task, numbered_tasks))
+    else:
+        with multiprocessing.Pool(processes, _init_shared_worker, (shared_arrays, instrumentation.enabled())) as pool:
+            runs = list(pool.imap_unordered(_run_shared_task, numbered_tasks))
 
-    return math.sqrt(distance)
+    results = [None] * len(numbered_tasks)
+    for number, result, profile in runs:
+        results[number] = result
+        if profile is not None:
+            instrumentation.merge(profile)
+    return results
@@ -0,0 +1,102 @@
+import collections
+import itertools
+
+import apriori
+
+
+class FPNode:
+    """ A node of an FP-tree: one item on a shared transaction prefix, with the number of transactions through it """
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+    def prefix_path(self):
+        """ Items on the path from the root down to (but excluding) this node """
+        path = []
+        node = self.parent
+        while node.item is not None:
+            path.append(node.item)
+            node = node.parent
+        path.reverse()
+        return path
+
+
+def build_tree(weighted_transactions, min_abs_sup):
+    """ Build an FP-tree from (transaction, count) pairs, returns the root and the header table """
+    item_support = collections.defaultdict(lambda: 0)
+    for transaction, count in weighted_transactions:
+        for item in transaction:
+            item_support[item] += count
+
+    # only frequent items go in the tree, ordered by descending support (then by item for determinism)
+    frequent_items = {item: support for item, support in item_support.items() if support >= min_abs_sup}
+    rank = {item: i for i, item in enumerate(sorted(frequent_items, key=lambda item: (-frequent_items[item], item)))}
+
+    root = FPNode(None, None)
+    header = collections.OrderedDict((item, []) for item in sorted(rank, key=rank.get))
+
+    for transaction, count in weighted_transactions:
+        path = sorted((item for item in transaction if item in rank), key=rank.get)
+
+        node = root
+        for item in path:
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                header[item].append(child)  # node-link from the header table
+            child.count += count
+            node = child
+
+    return root, header
+
+
+def single_path(root):
+    """ The nodes of the tree if it's a single chain, otherwise None """
+    path = []
+    node = root
+    while len(node.children) == 1:
+        node = next(iter(node.children.values()))
+        path.append(node)
+    return path if len(node.children) == 0 else None
+
+
+def mine_tree(root, header, min_abs_sup, suffix, frequent):
+    """ Recursively mine the frequent itemsets ending in 'suffix' from an (conditional) FP-tree """
+    path = single_path(root)
+    if path is not None:
+        # every combination of the nodes on a single path is frequent, with the support of its deepest node
+        for length in range(1, len(path) + 1):
+            for combination in itertools.combinations(path, length):
+                itemset = suffix.union(node.item for node in combination)
+                frequent[itemset] = combination[-1].count
+        return
+
+    # least frequent items first, each one's conditional tree only contains more frequent items
+    for item in reversed(header):
+        nodes = header[item]
+        itemset = suffix.union([item])
+        frequent[itemset] = sum(node.count for node in nodes)
+
+        # conditional pattern base: the prefix paths of every node holding the item
+        pattern_base = [(node.prefix_path(), node.count) for node in nodes]
+        conditional_root, conditional_header = build_tree(pattern_base, min_abs_sup)
+        if conditional_header:
+            mine_tree(conditional_root, conditional_header, min_abs_sup, itemset, frequent)
+
+
+def fp_growth(transactions, min_abs_sup):
+    """ Main FP-Growth algorithm, returns frequent itemsets and supports in the same shape as apriori() """
+    min_abs_sup = max(min_abs_sup, 1)  # as with apriori, itemsets that never occur are not reported
+
+    # each transaction is counted once, however many times an item is repeated in it
+    root, header = build_tree([(set(transaction), 1) for transaction in transactions], min_abs_sup)
+
+    frequent = {}
+    mine_tree(root, header, min_abs_sup, frozenset(), frequent)
+
+    # group by size into the k-itemset levels, ending with an empty level like apriori()
+    return apriori.group_by_size(frequent)
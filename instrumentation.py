@@ -0,0 +1,166 @@
+import collections
+import json
+import time
+import tracemalloc
+
+_profile = None  # the active Profile, None while instrumentation is off (the default)
+
+
+class Profile:
+    """ Wall time, call count and memory peak of each named phase, plus free-form counters """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.started_tracing = False  # whether tracemalloc was started for this profile
+        self.phases = collections.OrderedDict()  # phase name -> {"calls", "wall_time", "peak_memory"}
+        self.counters = collections.OrderedDict()
+        self.open_phases = []  # the phases currently running, innermost last
+
+    def record(self, name, wall_time, peak_memory, calls=1):
+        """ Add calls of a phase, their total wall time and their highest memory peak """
+        if name not in self.phases:
+            self.phases[name] = {"calls": 0, "wall_time": 0.0, "peak_memory": None}
+        phase = self.phases[name]
+        phase["calls"] += calls
+        phase["wall_time"] += wall_time
+        if peak_memory is not None:
+            phase["peak_memory"] = max(phase["peak_memory"] or 0, peak_memory)
+
+    def merge(self, other):
+        """ Add the phases and counters of another profile's as_dict() (e.g. from a worker process) """
+        # wall times are summed over processes, so a phase's total can exceed the elapsed time
+        for name, phase in other["phases"].items():
+            self.record(name, phase["wall_time"], phase["peak_memory"], phase["calls"])
+        for name, value in other["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        """ JSON-serialisable summary of the profile """
+        return {"phases": self.phases, "counters": self.counters}
+
+
+class _Phase:
+    """ Times one call of a named phase of the active profile """
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.start = None
+        self.start_memory = None
+        self.peak = 0  # highest traced memory reached before the last reset of the tracemalloc peak
+
+    def __enter__(self):
+        # the tracemalloc peak is reset for every phase, so the enclosing phase keeps the peak it had reached
+        if self.profile.trace_memory:
+            self.start_memory, peak = tracemalloc.get_traced_memory()
+            self._raise_outer_peak(peak)
+            tracemalloc.reset_peak()
+        self.profile.open_phases.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        wall_time = time.perf_counter() - self.start
+        self.profile.open_phases.pop()
+
+        peak_memory = None
+        if self.profile.trace_memory:
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            self._raise_outer_peak(peak)
+            peak_memory = max(0, peak - self.start_memory)  # bytes allocated above the level the phase started at
+
+        self.profile.record(self.name, wall_time, peak_memory)
+        return False
+
+    def _raise_outer_peak(self, peak):
+        if self.profile.open_phases:
+            outer = self.profile.open_phases[-1]
+            outer.peak = max(outer.peak, peak)
+
+
+class _NullPhase:
+    """ Shared do-nothing phase, so instrumented code costs one function call while instrumentation is off """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def enable(trace_memory=True):
+    """ Start recording phases into a new profile, memory peaks are traced with tracemalloc """
+    global _profile
+    # per-phase memory peaks need tracemalloc.reset_peak (Python 3.9+)
+    trace_memory = trace_memory and hasattr(tracemalloc, "reset_peak")
+    _profile = Profile(trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _profile.started_tracing = True
+    return _profile
+
+
+def disable():
+    """ Stop recording, returns the finished profile (or None if instrumentation wasn't on) """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is not None and profile.started_tracing:
+        tracemalloc.stop()
+    return profile
+
+
+def enabled():
+    """ Whether phases are being recorded """
+    return _profile is not None
+
+
+def phase(name):
+    """ Context manager timing one call of a named phase (e.g. with phase("k_means.assignment"): ...) """
+    if _profile is None:
+        return _NULL_PHASE
+    return _Phase(_profile, name)
+
+
+def count(name, amount=1):
+    """ Add to a named counter (e.g. candidates generated) """
+    if _profile is not None:
+        _profile.counters[name] = _profile.counters.get(name, 0) + amount
+
+
+def merge(profile_dict):
+    """ Merge a profile recorded elsewhere (e.g. by a worker process) into the active profile """
+    if _profile is not None:
+        _profile.merge(profile_dict)
+
+
+def best_time(function, repeats, time_budget=float("inf")):
+    """ Best wall time of up to 'repeats' calls of a function (fewer once the budget is spent), and its result """
+    fastest = float("inf")
+    total = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        fastest = min(fastest, elapsed)
+        total += elapsed
+        if total > time_budget:
+            break
+    return fastest, result
+
+
+def to_json(profile, **json_options):
+    """ Profile as JSON text """
+    return json.dumps(profile.as_dict(), **json_options)
+
+
+def write_json(profile, file_name):
+    """ Write the profile as JSON, to standard output if file_name is '-' """
+    text = to_json(profile, indent=2)
+    if file_name == "-":
+        print(text)
+    else:
+        with open(file_name, "w") as json_file:
+            json_file.write(text + "\n")
@@ -1,14 +1,22 @@
-import csv
 import math
 from operator import itemgetter
 import collections
 
+import numpy as np
+
 import data_mining_utilities
+import instrumentation
+import neighbour_index
+
+
+FEATURE_COLUMNS = ('Shoe Size', 'Height')
+TRAINING_BLOCK_K_RATIO = 32  # training vectors per block for each neighbour searched for, keeps the selection cheap
 
 
-def ad_hoc_analysis():
+def ad_hoc_analysis(file_name=data_mining_utilities.SURVEY_FILE):
     """ Histogram of genders (used to create cleaning rules in the 'clean_gender' function) """
-    raw_genders = [row['Gender'] for row in csv.DictReader(open('Data Mining - Spring 2017.csv'))]
+    columns, _ = data_mining_utilities.load_columns(file_name, nominal_columns={'Gender': None})
+    raw_genders = columns['Gender']
     gender_frequencies = data_mining_utilities.histogram_nominal(raw_genders)
     return gender_frequencies
 
@@ -23,113 +31,391 @@ def clean_gender(raw_gender):
         return None
 
 
-def load_attributes(full_data):
-    """ Load the gender, shoe size and height data """
-    genders = []
-    shoe_sizes = []
-    heights = []
+def clean_label(raw_label):
+    """ Labels other than gender are compared in lower case, blank labels are discarded """
+    return raw_label.strip().lower() or None
+
+
+def load_attributes(full_data, chunk_size=data_mining_utilities.CSV_CHUNK_SIZE, label_column='Gender',
+                    feature_columns=FEATURE_COLUMNS):
+    """ Load the labels (gender by default) and the numeric features (shoe size and height by default) """
+    # full_data is the CSV file name, or its rows as dicts (e.g. a csv.DictReader)
+    if label_column == 'Gender':
+        label_cleaner = lambda gender: clean_gender(gender.lower())
+    else:
+        label_cleaner = clean_label
 
-    for row in full_data:
-        subset = []
+    # vectors are discarded unless all of their attributes were successfully cleaned
+    columns, _ = data_mining_utilities.load_columns(full_data, list(feature_columns), {label_column: label_cleaner},
+                                                    chunk_size)
 
-        gender = clean_gender(row['Gender'].lower())
-        if gender is not None:  # if gender is one of the accepted values
-            subset.append(gender)
+    return (columns[label_column],) + tuple(columns[column] for column in feature_columns)
 
-        # exception handling to catch any non-numeric data before cleaning it
-        try:
-            subset.append(float(row['Shoe Size'].replace(",", ".")))
-        except ValueError as e:
-            print(e)
 
-        try:
-            subset.append(float(row['Height'].replace(",", ".")))
-        except ValueError as e:
-            print(e)
+def load_normalised_attributes(file_name, new_min, new_max, cache_dir=None, label_column='Gender',
+                               feature_columns=FEATURE_COLUMNS):
+    """ Load the cleaned labels and min/max normalised features, through the columnar cache """
+    def build():
+        labels, *features = load_attributes(file_name, label_column=label_column, feature_columns=feature_columns)
+        columns = collections.OrderedDict([(label_column, labels)])
+        for column, values in zip(feature_columns, features):
+            columns[column] = data_mining_utilities.min_max_normalise(values, new_min, new_max)
+        return columns
 
-        # keep the vector if all three attributes were successfully cleaned
-        # (discard the vector if not)
-        if len(subset) == 3:
-            genders.append(subset[0])
-            shoe_sizes.append(subset[1])
-            heights.append(subset[2])
+    if cache_dir is None:
+        columns = build()
+    else:
+        parameters = {'columns': [label_column] + list(feature_columns), 'new_min': new_min, 'new_max': new_max,
+                      'loader': 'kNN.load_normalised_attributes'}
+        columns = data_mining_utilities.cached_columns(file_name, parameters, build, cache_dir)
 
-    return genders, shoe_sizes, heights
+    return tuple(columns.values())
 
 
-def get_neighbours(training_data, test_vector, k):
-    """ Get the k nearest neighbours to a test data point """
-    distances = []
+def load_normalised_vectors(file_name, new_min=-1, new_max=1, cache_dir=None, label_column='Gender',
+                            feature_columns=FEATURE_COLUMNS):
+    """ Labelled vectors (label followed by the normalised features) ready for k-NN """
+    attributes = load_normalised_attributes(file_name, new_min, new_max, cache_dir, label_column, feature_columns)
+
+    # recombine the cleaned/normalised attributes into vectors
+    normalised_vectors = []
+    for vector in zip(*attributes):
+        normalised_vectors.append(vector)
+
+    return normalised_vectors
 
-    for vector in training_data:
-        distance_to_new_data = data_mining_utilities.euclidean_distance(test_vector, vector[1:])
-        distances.append((vector, distance_to_new_data))
 
-    distances = sorted(distances, key=itemgetter(1))  # sort by distance to the vector being tested
+def split_data(normalised_vectors, training_fraction=2 / 3):
+    """ Split data in file order into training data and testing data """
+    split_point = math.floor(len(normalised_vectors) * training_fraction)
+    return normalised_vectors[:split_point], normalised_vectors[split_point:]
 
-    nearest_neighbours = []
-    for i in range(k):  # return the k nearest neighbours
-        nearest_neighbours.append(distances[i])
 
-    return nearest_neighbours
+def build_index(training_data, method="auto"):
+    """ Build a nearest neighbour index over the attributes of the training data (labels excluded) """
+    with instrumentation.phase("kNN.index_build"):
+        return neighbour_index.NeighbourIndex([vector[1:] for vector in training_data], method=method)
+
+
+def get_neighbours(training_data, test_vector, k, index=None):
+    """ Get the k nearest neighbours to a test data point """
+    with instrumentation.phase("kNN.neighbour_search"):
+        if index is None:
+            index = build_index(training_data, method="brute")
+
+        # ordered by distance to the vector being tested (ties keep the training data order)
+        indices, distances = index.query(test_vector, k)
+
+        nearest_neighbours = []
+        for i, distance in zip(indices, distances):  # return the k nearest neighbours
+            nearest_neighbours.append((training_data[i], float(distance)))
+
+        return nearest_neighbours
 
 
 def vote(nearest_neighbours):
     """ Get the most frequent label in a set of nearest neighbours """
-    votes = collections.defaultdict(lambda: 0)
+    with instrumentation.phase("kNN.vote"):
+        votes = collections.defaultdict(lambda: 0)
 
-    for neighbour in nearest_neighbours:
-        votes[neighbour[0][0]] += 1
+        for neighbour in nearest_neighbours:
+            votes[neighbour[0][0]] += 1
 
-    votes = sorted(votes.items(), key=itemgetter(1))  # sort by number of votes each label had
-    return votes[-1][0]  # return label with the most votes
+        votes = sorted(votes.items(), key=itemgetter(1))  # sort by number of votes each label had
+        return votes[-1][0]  # return label with the most votes
 
 
 def show_accuracy(training_data, test_data, min_k, max_k):
     """ Verbose output of the prediction accuracy for each value of k """
-    for k in range(min_k, max_k + 1):
-        print("k =", str(k) + ":", str(accuracy(training_data, test_data, k)) + "% accuracy")
-
-def accuracy(training_data, test_data, k):
+    for k, k_accuracy in accuracy_sweep(training_data, test_data, min_k, max_k).items():
+        print("k =", str(k) + ":", str(k_accuracy) + "% accuracy")
+
+
+def vote_leaders(neighbour_labels, num_classes, weights=None):
+    """ Predicted label code of every test vector for each k from 1 to the number of neighbours (one column per k) """
+    # running (weighted) vote counts over each row of neighbour label codes, nearest first
+    num_tests, max_k = neighbour_labels.shape
+    rows = np.arange(num_tests)
+    votes = np.zeros((num_tests, num_classes))
+    first_seen = np.full((num_tests, num_classes), -1, dtype=np.int64)
+
+    leaders = np.empty((num_tests, max_k), dtype=np.int64)
+    leader = neighbour_labels[:, 0]
+    for position in range(max_k):
+        labels = neighbour_labels[:, position]
+        unseen = first_seen[rows, labels] < 0
+        first_seen[rows[unseen], labels[unseen]] = position
+        votes[rows, labels] += 1 if weights is None else weights[:, position]
+
+        # same tie-breaking as 'vote': of the labels with the most votes, the one first seen last wins
+        # (only the label that just got a vote can overtake the leader)
+        label_votes = votes[rows, labels]
+        leader_votes = votes[rows, leader]
+        overtakes = (label_votes > leader_votes) | \
+            ((label_votes == leader_votes) & (first_seen[rows, labels] > first_seen[rows, leader]))
+        leader = np.where(overtakes, labels, leader)
+        leaders[:, position] = leader
+
+    return leaders
+
+
+def accuracy_sweep(training_data, test_data, min_k, max_k, index=None):
+    """ Prediction accuracy for every k in [min_k, max_k] from a single neighbour search per test vector """
+    model = KNNClassifier(max_k).fit(training_data, index)
+    codes = {label: code for code, label in enumerate(model.classes.tolist())}
+    test_codes = [codes.get(test_vector[0], -1) for test_vector in test_data]  # -1: a label never seen in training
+    return model.accuracy_sweep_codes([test_vector[1:] for test_vector in test_data], test_codes, min_k)
+
+
+def accuracy(training_data, test_data, k, index=None):
     """ Invoke k-NN algorithm using the test data """
+    if index is None:
+        index = build_index(training_data)  # built once, shared by every test vector
+
     correct_predictions = 0
 
     for test_vector in test_data:
-        predicted_label = kNN(training_data, test_vector[1:], k)  # invoke the k-NN classification
+        predicted_label = kNN(training_data, test_vector[1:], k, index)  # invoke the k-NN classification
         if predicted_label == test_vector[0]:  # correctly predicted the test data
             correct_predictions += 1
 
     return (correct_predictions / len(test_data)) * 100.0  # percentage of test vectors correctly predicted
 
 
-def kNN(training_data, test_vector, k):
+def kNN(training_data, test_vector, k, index=None):
     """ Main k-nearest neighbour function """
-    nearest_neighbours = get_neighbours(training_data, test_vector, k)
+    nearest_neighbours = get_neighbours(training_data, test_vector, k, index)
     predicted_label = vote(nearest_neighbours)
     return predicted_label
 
-#print(ad_hoc_analysis())  # initial ad-hoc analysis of nominal data
 
-file = csv.DictReader(open('Data Mining - Spring 2017.csv'))
-genders, shoe_sizes, heights = load_attributes(file)  # apply cleaning rules
+class KNNClassifier:
+    """ k-NN classifier over a contiguous feature matrix and integer-encoded labels, with batched predictions """
+
+    def __init__(self, k, weighting="uniform", method="brute", block_size=data_mining_utilities.DISTANCE_BLOCK_SIZE):
+        if weighting not in ("uniform", "distance"):
+            raise ValueError("Unknown weighting: " + str(weighting))
+        if method not in ("brute", "kd_tree"):
+            raise ValueError("Unknown neighbour search method: " + str(method))
+
+        self.k = k
+        self.weighting = weighting
+        self.method = method
+        self.block_size = block_size
+
+    def fit(self, training_data, index=None):
+        """ Encode training data (tuples of label followed by the attributes) as a feature matrix and label codes """
+        classes, labels = np.unique([vector[0] for vector in training_data], return_inverse=True)
+        return self.fit_encoded([vector[1:] for vector in training_data], labels.reshape(-1), classes, index)
+
+    def fit_encoded(self, features, labels, classes, index=None):
+        """ Fit to a feature matrix and label codes (indices into classes) that are already encoded """
+        # index can be a NeighbourIndex already built over the same features, it's used whatever the method
+        self.features = data_mining_utilities.as_float_array(features)
+        self.labels = np.asarray(labels)
+        self.classes = np.asarray(classes)
+
+        self.index = index
+        if self.index is None and self.method == "kd_tree":
+            # the index falls back to brute force where a KD-tree wouldn't pay off (high dimensions, few vectors),
+            # the blocked brute force search below is the faster one then
+            with instrumentation.phase("kNN.index_build"):
+                self.index = neighbour_index.NeighbourIndex(self.features, method="auto")
+            if self.index.method != "kd_tree":
+                self.index = None
+
+        return self
+
+    def kneighbours(self, test_matrix):
+        """ Indices and distances of the k nearest training vectors to each test vector """
+        with instrumentation.phase("kNN.neighbour_search"):
+            test_matrix = data_mining_utilities.as_float_array(test_matrix)
+            k = min(self.k, len(self.features))
+
+            if self.index is not None:
+                results = [self.index.query(vector, k) for vector in test_matrix]
+                return np.array([indices for indices, _ in results]), np.array([distances for _, distances in results])
+
+            indices = np.empty((len(test_matrix), k), dtype=np.intp)
+            distances = np.empty((len(test_matrix), k))
+            for start in range(0, len(test_matrix), self.block_size):
+                test_block = test_matrix[start: start + self.block_size]
+                indices[start: start + len(test_block)], distances[start: start + len(test_block)] = \
+                    self._block_kneighbours(test_block, k)
+
+            return indices, distances
+
+    def _block_kneighbours(self, test_block, k):
+        """ k nearest training vectors to a block of test vectors, a block of the training vectors at a time """
+        # the k nearest of each training block are candidates, kept in block order so ties between candidates
+        # still resolve by index (the (distance, position) order of the candidates is their (distance, index) order)
+        test_norms = np.einsum("ij,ij->i", test_block, test_block)[:, np.newaxis]
+        candidate_indices = []
+        candidate_distances = []
+        training_block_size = max(self.block_size, TRAINING_BLOCK_K_RATIO * k)
+        for start in range(0, len(self.features), training_block_size):
+            training_block = self.features[start: start + training_block_size]
+            num_nearest = min(k, len(training_block))
+
+            # the matrix product form of the distances rounds exact ties apart, so it only narrows the block down
+            # to the points within a rounding margin of the k-th nearest, which are then compared exactly
+            approximate = data_mining_utilities.pairwise_distances(test_block, training_block, "sqeuclidean")
+            positions = np.argpartition(approximate, num_nearest - 1, axis=1)
+            kth_distance = np.take_along_axis(approximate, positions[:, num_nearest - 1: num_nearest], axis=1)
+            margin = data_mining_utilities.ROUNDING_MARGIN * \
+                (test_norms + np.einsum("ij,ij->i", training_block, training_block).max())
+            num_candidates = int((approximate <= kth_distance + margin).sum(axis=1).max())
+            if num_candidates > num_nearest:  # near ties with the k-th nearest, rare outside of grid-like data
+                positions = np.argpartition(approximate, num_candidates - 1, axis=1)
+            positions = np.sort(positions[:, :num_candidates], axis=1)  # in index order, so exact ties resolve by index
+
+            # exact distances from the differences, as distances_to takes them
+            differences = training_block[positions] - test_block[:, np.newaxis, :]
+            distances = np.sqrt(np.einsum("ijk,ijk->ij", differences, differences))
+            nearest = neighbour_index.nearest_neighbour_indices(distances, num_nearest)
+            candidate_indices.append(np.take_along_axis(positions, nearest, axis=1) + start)
+            candidate_distances.append(np.take_along_axis(distances, nearest, axis=1))
+
+        candidate_indices = np.concatenate(candidate_indices, axis=1)
+        candidate_distances = np.concatenate(candidate_distances, axis=1)
+        positions = neighbour_index.nearest_neighbour_indices(candidate_distances, k)
+        return np.take_along_axis(candidate_indices, positions, axis=1), \
+            np.take_along_axis(candidate_distances, positions, axis=1)
+
+    def predict_codes(self, test_matrix):
+        """ Predicted label codes for each test vector """
+        indices, distances = self.kneighbours(test_matrix)
+        with instrumentation.phase("kNN.vote"):
+            neighbour_labels = self.labels[indices]
+
+            weights = None
+            if self.weighting == "distance":
+                # inverse distance weights, an exact match outvotes everything else
+                with np.errstate(divide="ignore"):
+                    weights = 1.0 / distances
+                exact = np.isinf(weights)
+                weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(np.float64), weights)
+
+            # votes for all of the test vectors at once, the leader once all k neighbours have voted
+            return vote_leaders(neighbour_labels, len(self.classes), weights)[:, -1]
+
+    def accuracy_sweep_codes(self, test_matrix, test_codes, min_k=1):
+        """ Accuracy for every k from min_k up to self.k (uniform votes) from a single neighbour search """
+        test_matrix = data_mining_utilities.as_float_array(test_matrix)
+        test_codes = np.asarray(test_codes)
+        max_k = min(self.k, len(self.features))
+
+        correct_predictions = np.zeros(max_k + 1, dtype=np.int64)  # indexed by k
+        for start in range(0, len(test_matrix), self.block_size):
+            correct_predictions += self._sweep_correct_predictions(test_matrix[start: start + self.block_size],
+                                                                   test_codes[start: start + self.block_size])
+
+        accuracies = collections.OrderedDict()
+        for k in range(min_k, max_k + 1):
+            accuracies[k] = (int(correct_predictions[k]) / len(test_matrix)) * 100.0
+
+        return accuracies
+
+    def _sweep_correct_predictions(self, test_block, test_codes):
+        """ Number of correct predictions for every k (indexed by k) over a block of test vectors """
+        indices, _ = self.kneighbours(test_block)
+        with instrumentation.phase("kNN.vote"):
+            # the neighbour ordering for max_k contains the ordering for every smaller k
+            leaders = vote_leaders(self.labels[indices], len(self.classes))
+
+            correct_predictions = np.zeros(leaders.shape[1] + 1, dtype=np.int64)  # indexed by k
+            correct_predictions[1:] = (leaders == test_codes[:, np.newaxis]).sum(axis=0)
+            return correct_predictions
+
+    def predict(self, test_matrix):
+        """ Predicted labels for each test vector """
+        return self.classes[self.predict_codes(test_matrix)]
+
+    def accuracy(self, test_data):
+        """ Percentage of test data (tuples of label followed by the attributes) correctly predicted """
+        predicted = self.predict([vector[1:] for vector in test_data])
+        actual = np.array([vector[0] for vector in test_data])
+        return (np.sum(predicted == actual) / len(test_data)) * 100.0
+
+
+def stratified_folds(labels, num_folds, numpy_random, stratified=True):
+    """ Split the data points into folds (arrays of indices), keeping each label's share the same in every fold """
+    labels = np.asarray(labels)
+    if stratified:
+        groups = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+    else:
+        groups = [np.arange(len(labels))]
+
+    folds = [[] for _ in range(num_folds)]
+    offset = 0
+    for group in groups:
+        # deal each label's shuffled data points out to the folds in turn, carrying on where the last label finished
+        for position, index in enumerate(numpy_random.permutation(group)):
+            folds[(offset + position) % num_folds].append(index)
+        offset += len(group)
+
+    return [np.sort(np.array(fold, dtype=np.intp)) for fold in folds]
+
+
+def _cross_validate_fold(arrays, task):
+    """ Accuracy for every k of one fold: train on everything else, test on the fold """
+    test_indices, classes, min_k, max_k = task
+    features = arrays["features"]
+    labels = arrays["labels"]
+
+    is_test = np.zeros(len(labels), dtype=bool)
+    is_test[test_indices] = True
+
+    # straight from the shared arrays, the neighbour ordering for max_k contains the ordering for every smaller k
+    model = KNNClassifier(max_k).fit_encoded(features[~is_test], labels[~is_test], classes)
+    return model.accuracy_sweep_codes(features[is_test], labels[is_test], min_k)
+
+
+def cross_validate(data, num_folds=5, repeats=1, min_k=1, max_k=None, seed=None, processes=None, stratified=True):
+    """ Repeated (stratified) k-fold cross-validation, returns the mean and standard deviation of accuracy per k """
+    classes, labels = np.unique([vector[0] for vector in data], return_inverse=True)
+    features = data_mining_utilities.as_float_array([vector[1:] for vector in data])
+
+    # every repeat reshuffles the folds, the seed makes the whole run reproducible
+    numpy_random = np.random.RandomState(seed)
+    folds = []
+    for _ in range(repeats):
+        folds += stratified_folds(labels, num_folds, numpy_random, stratified)
+
+    # k can't be larger than the smallest training set
+    smallest_training_set = len(data) - max(len(fold) for fold in folds)
+    max_k = smallest_training_set if max_k is None else min(max_k, smallest_training_set)
+    tasks = [(fold, list(classes), min_k, max_k) for fold in folds if len(fold) > 0]
+
+    # the normalised data is shared with the worker processes once, rather than pickled with every fold
+    fold_accuracies = data_mining_utilities.parallel_map(_cross_validate_fold, tasks,
+                                                         {"features": features, "labels": labels}, processes)
+
+    results = collections.OrderedDict()
+    for k in range(min_k, max_k + 1):
+        accuracies = np.array([fold_accuracy[k] for fold_accuracy in fold_accuracies])
+        results[k] = (float(accuracies.mean()), float(accuracies.std(ddof=1)) if len(accuracies) > 1 else 0.0)
+
+    return results
+
+
+def main(file_name=data_mining_utilities.SURVEY_FILE, label_column='Gender', feature_columns=FEATURE_COLUMNS,
+         min_k=1, max_k=None, training_fraction=2 / 3, new_min=-1, new_max=1,
+         cache_dir=data_mining_utilities.CACHE_DIRECTORY):
+    """ Test the prediction accuracy for different values of k on a training/testing split of the survey """
+    #print(ad_hoc_analysis(file_name))  # initial ad-hoc analysis of nominal data
+
+    # apply cleaning rules and normalise numeric data (cached after the first run)
+    normalised_vectors = load_normalised_vectors(file_name, new_min, new_max, cache_dir, label_column,
+                                                 feature_columns)
 
-# normalise numeric data
-new_min = -1
-new_max = 1
-shoe_sizes = data_mining_utilities.min_max_normalise(shoe_sizes, new_min, new_max)
-heights = data_mining_utilities.min_max_normalise(heights, new_min, new_max)
+    # split data into 2/3 training data, 1/3 testing data
+    training_data, test_data = split_data(normalised_vectors, training_fraction)
 
-# recombine the cleaned/normalised attributes into 3-dimensional vectors
-normalised_vectors = []
-for vector in zip(genders, shoe_sizes, heights):
-    normalised_vectors.append(vector)
+    # test the prediction accuracy for different values of k
+    maximum_k = len(training_data) if max_k is None else max_k
+    show_accuracy(training_data, test_data, min_k, maximum_k)
 
-# split data into 2/3 training data, 1/3 testing data
-split_point = math.floor(len(normalised_vectors) * 2 / 3)
-training_data = normalised_vectors[:split_point]
-test_data = normalised_vectors[split_point:]
 
-# test the prediction accuracy for different values of k
-minimum_k = 1
-maximum_k = len(training_data)
-show_accuracy(training_data, test_data, minimum_k, maximum_k)
+if __name__ == '__main__':
+    main()
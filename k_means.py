@@ -1,49 +1,135 @@
-import csv
-import operator
 import random
 import collections
 
+import numpy as np
+
 import data_mining_utilities
+import instrumentation
+
+BOUND_SLACK = 1e-12  # relative slack so rounding in the distance bounds never skips a point that could move
+
+
+ATTRIBUTE_COLUMNS = ('Age', 'Shoe Size', 'Height')
+
+
+def load_attributes(full_data, chunk_size=data_mining_utilities.CSV_CHUNK_SIZE, columns=ATTRIBUTE_COLUMNS):
+    """ Extract and clean the numeric attributes (age, shoe size, and height by default) """
+    # full_data is the CSV file name, or its rows as dicts (e.g. a csv.DictReader)
+    # vectors are discarded unless all of their attributes were successfully cleaned
+    loaded, _ = data_mining_utilities.load_columns(full_data, list(columns), chunk_size=chunk_size)
+
+    return tuple(loaded[column] for column in columns)
+
+
+def load_normalised_attributes(file_name, new_min, new_max, cache_dir=None, columns=ATTRIBUTE_COLUMNS):
+    """ Load the min/max normalised numeric attributes, through the columnar cache """
+    def build():
+        attributes = zip(columns, load_attributes(file_name, columns=columns))
+        return collections.OrderedDict(
+            (name, data_mining_utilities.min_max_normalise(values, new_min, new_max)) for name, values in attributes)
+
+    if cache_dir is None:
+        loaded = build()
+    else:
+        parameters = {'columns': list(columns), 'new_min': new_min, 'new_max': new_max,
+                      'loader': 'k_means.load_normalised_attributes'}
+        loaded = data_mining_utilities.cached_columns(file_name, parameters, build, cache_dir)
+
+    return tuple(loaded[column] for column in columns)
+
+
+def load_normalised_vectors(file_name, new_min=-1, new_max=1, cache_dir=None, columns=ATTRIBUTE_COLUMNS):
+    """ Recombine the cleaned/normalised attributes into vectors """
+    normalised_vectors = []
+    for vector in zip(*load_normalised_attributes(file_name, new_min, new_max, cache_dir, columns)):
+        normalised_vectors.append(vector)
 
+    return normalised_vectors
 
-def load_attributes(full_data):
-    """ Extract and clean the age, shoe size, and height attributes """
-    ages = []
-    shoe_sizes = []
-    heights = []
 
-    for row in full_data:
-        subset = []
+KMEANS_PARALLEL_ROUNDS = 5  # sampling rounds of k-means|| seeding
+SEEDING_METHODS = ("random", "k-means++", "k-means||")
 
-        # exception handling to catch any non-numeric data before cleaning it
-        try:
-            subset.append(float(row['Age'].replace(",", ".")))
-        except ValueError as e:
-            print(e)
 
-        try:
-            subset.append(float(row['Shoe Size'].replace(",", ".")))
-        except ValueError as e:
-            print(e)
+def _weighted_choice(weights, numpy_random):
+    """ Index chosen with probability proportional to its weight (uniformly if every weight is zero) """
+    total = weights.sum()
+    if total <= 0:
+        return numpy_random.randint(len(weights))
+    index = int(np.searchsorted(np.cumsum(weights), numpy_random.random_sample() * total, side="right"))
+    return min(index, len(weights) - 1)
 
-        try:
-            subset.append(float(row['Height'].replace(",", ".")))
-        except ValueError as e:
-            print(e)
 
-        # keep the vector if all three attributes were successfully cleaned
-        # (discard the vector if not)
-        if len(subset) == 3:
-            ages.append(subset[0])
-            shoe_sizes.append(subset[1])
-            heights.append(subset[2])
+def k_means_plus_plus(points, k, numpy_random, weights=None):
+    """ Indices of k points chosen by k-means++ (optionally weighted), each with probability ~ D(x)^2 """
+    if weights is None:
+        weights = np.ones(len(points))
 
-    return ages, shoe_sizes, heights
+    chosen = [_weighted_choice(weights, numpy_random)]
+    # squared distance from every point to its nearest chosen centroid, updated with one batch per centroid
+    nearest_squared = data_mining_utilities.distances_to(points[chosen[0]], points, "sqeuclidean")
 
+    while len(chosen) < k:
+        probabilities = weights * nearest_squared
+        probabilities[chosen] = 0  # only happens to matter when there are fewer distinct points than k
+        if probabilities.sum() <= 0:
+            remaining = np.setdiff1d(np.arange(len(points)), chosen)
+            index = int(remaining[numpy_random.randint(len(remaining))])
+        else:
+            index = _weighted_choice(probabilities, numpy_random)
 
-def initial_centroids(vectors, k):
-    """ Randomly select k data points to be the initial set of centroids """
-    random_vectors = random.sample(vectors, k)  # random sampling of data points (without replacement)
+        chosen.append(index)
+        np.minimum(nearest_squared, data_mining_utilities.distances_to(points[index], points, "sqeuclidean"),
+                   out=nearest_squared)
+
+    return chosen
+
+
+def k_means_parallel(points, k, numpy_random, rounds=KMEANS_PARALLEL_ROUNDS, oversampling=None):
+    """ Indices of k points chosen by k-means|| : oversample in a few rounds, then recluster with k-means++ """
+    oversampling = 2 * k if oversampling is None else oversampling
+
+    candidates = [numpy_random.randint(len(points))]
+    nearest_squared = data_mining_utilities.distances_to(points[candidates[0]], points, "sqeuclidean")
+
+    for _ in range(rounds):
+        cost = nearest_squared.sum()
+        if cost <= 0:
+            break
+
+        # every point is sampled independently, so each round is one batched distance update
+        sampled = np.flatnonzero(numpy_random.random_sample(len(points)) < oversampling * nearest_squared / cost)
+        if len(sampled) == 0:
+            continue
+        candidates.extend(sampled.tolist())
+        new_distances = data_mining_utilities.pairwise_distances(points, points[sampled], "sqeuclidean")
+        np.minimum(nearest_squared, new_distances.min(axis=1), out=nearest_squared)
+
+    candidates = np.unique(candidates)
+    if len(candidates) < k:  # too few candidates, top up with random points
+        others = np.setdiff1d(np.arange(len(points)), candidates)
+        candidates = np.concatenate((candidates, numpy_random.choice(others, k - len(candidates), replace=False)))
+
+    # weight each candidate by the number of points nearest to it, then pick k of them with k-means++
+    nearest_candidate = data_mining_utilities.pairwise_distances(points, points[candidates]).argmin(axis=1)
+    weights = np.bincount(nearest_candidate, minlength=len(candidates)).astype(np.float64)
+    return [int(candidates[i]) for i in k_means_plus_plus(points[candidates], k, numpy_random, weights)]
+
+
+def initial_centroids(vectors, k, random_generator=random, method="random"):
+    """ Select k data points to be the initial set of centroids (randomly, by k-means++ or by k-means||) """
+    if method not in SEEDING_METHODS:
+        raise ValueError("Unknown seeding method: " + str(method))
+
+    with instrumentation.phase("k_means.seeding"):
+        if method == "random":
+            random_vectors = random_generator.sample(vectors, k)  # random sampling of data points (without replacement)
+        else:
+            # the numpy generator is seeded from the given one, so the seeding stays reproducible under random.seed
+            numpy_random = np.random.RandomState(random_generator.getrandbits(32))
+            points = data_mining_utilities.as_float_array(vectors)
+            seeding = k_means_plus_plus if method == "k-means++" else k_means_parallel
+            random_vectors = [vectors[i] for i in seeding(points, k, numpy_random)]
 
     clusters = collections.OrderedDict()
     for i, vector in enumerate(random_vectors):  # assign each centroid an arbitrary ID number
@@ -52,18 +138,24 @@ def initial_centroids(vectors, k):
     return clusters
 
 
+def nearest_centroids(vectors, centroids):
+    """ Find the ID of the nearest centroid to each data point """
+    cluster_ids = list(centroids.keys())
+    centroid_matrix = data_mining_utilities.as_float_array(list(centroids.values()))
+
+    # calculate the Euclidean distance from each data point to every centroid in one batch,
+    # ties go to the first centroid, as with min() over the centroids in order
+    nearest = full_assignment(data_mining_utilities.as_float_array(vectors), centroid_matrix,
+                              np.arange(len(cluster_ids)))[0]
+    return [cluster_ids[index] for index in nearest]
+
+
 def initial_clusters(vectors, centroids):
     """ Assign all of the unlabelled data points to their nearest centroid """
     initial_clusters = []
 
-    # calculate the Euclidean distance from each data point to every centroid
-    for vector in vectors:
-        distances = {}
-        for cluster_id, centroid in centroids.items():
-            distances[cluster_id] = data_mining_utilities.euclidean_distance(vector, centroid)
-
-        # assign the cluster ID of the nearest centroid to the data point
-        nearest_centroid = min(distances.items(), key=operator.itemgetter(1))[0]
+    # assign the cluster ID of the nearest centroid to each data point
+    for nearest_centroid, vector in zip(nearest_centroids(vectors, centroids), vectors):
         initial_clusters.append([nearest_centroid, vector])
 
     return initial_clusters
@@ -77,23 +169,42 @@ def get_vectors_in_clusters(labelled_vectors):
     return clusters
 
 
+def cluster_order(labels):
+    """ The non-empty clusters, in order of the first data point assigned to each """
+    clusters, first_index = np.unique(labels, return_index=True)
+    return clusters[np.argsort(first_index)]
+
+
+def update_centroid_matrix(vectors, labels, num_clusters, percentage_trimmed=0.1):
+    """ Trimmed mean of the data points in each cluster (rows of NaN for empty clusters) """
+    centroids = np.full((num_clusters, vectors.shape[1]), np.nan)
+
+    # group the data points by cluster with one sort of the labels
+    order = np.argsort(labels, kind="stable")
+    counts = np.bincount(labels, minlength=num_clusters)
+    ends = np.cumsum(counts)
+
+    for cluster in np.flatnonzero(counts):
+        vectors_in_cluster = vectors[order[ends[cluster] - counts[cluster]: ends[cluster]]]
+        centroids[cluster] = data_mining_utilities.trimmed_mean_columns(vectors_in_cluster, percentage_trimmed)
+
+    return centroids
+
+
 def update_centroids(labelled_vectors):
     """ Update the cluster centroids to be the mean of the data points in the cluster """
-    new_centroids = {}
-
-    clusters = get_vectors_in_clusters(labelled_vectors)  # every data point grouped by cluster ID
+    cluster_ids = list(collections.OrderedDict.fromkeys(vector[0] for vector in labelled_vectors))
+    position = {cluster_id: i for i, cluster_id in enumerate(cluster_ids)}
 
-    for cluster_id, vectors_in_cluster in clusters.items():
-        attribute_values = []
-        for i in range(len(labelled_vectors[0][1])):
-            attribute_values.append([vector[i] for vector in vectors_in_cluster])
+    vectors = data_mining_utilities.as_float_array([vector[1] for vector in labelled_vectors])
+    labels = np.array([position[vector[0]] for vector in labelled_vectors], dtype=np.intp)
 
-        # update the centroid of a cluster to be the trimmed mean of the data points in the cluster
-        attribute_means = []
-        for attribute in attribute_values:
-            attribute_means.append(data_mining_utilities.trimmed_mean(attribute, 0.1))
+    # update the centroid of a cluster to be the trimmed mean of the data points in the cluster
+    centroids = update_centroid_matrix(vectors, labels, len(cluster_ids))
 
-            new_centroids[cluster_id] = attribute_means
+    new_centroids = {}
+    for i, cluster_id in enumerate(cluster_ids):
+        new_centroids[cluster_id] = centroids[i].tolist()
 
     return new_centroids
 
@@ -102,15 +213,10 @@ def update_vectors(centroids, vectors):
     """ Update each data point's cluster label to the centroid nearest to it """
     updated_vector_labels = []
 
-    # calculate the Euclidean distance from each data point to every centroid
-    for vector in vectors:
-        distances = {}
-        for cluster_id, centroid in centroids.items():
-            distances[cluster_id] = data_mining_utilities.euclidean_distance(vector[1], centroid)
-
-        # update the cluster ID of the data point to the nearest centroid
-        nearest_centroid = min(distances.items(), key=operator.itemgetter(1))[0]
-        updated_vector_labels.append([nearest_centroid, vector[1]])
+    # update the cluster ID of each data point to the nearest centroid
+    points = [vector[1] for vector in vectors]
+    for nearest_centroid, point in zip(nearest_centroids(points, centroids), points):
+        updated_vector_labels.append([nearest_centroid, point])
 
     return updated_vector_labels
 
@@ -127,68 +233,226 @@ def cluster_quality(centroids, labelled_vectors):
     return data_mining_utilities.mean(intra_cluster_variance)
 
 
-def k_means(initial_centroids, initial_labelled_vectors, k):
+def full_assignment(vectors, centroids, clusters):
+    """ Nearest and second nearest centroid distances for every data point, ties go to the first cluster """
+    rows = np.arange(len(vectors))
+    centroid_matrix = centroids[clusters]
+    if len(clusters) == 1:
+        differences = vectors - centroid_matrix
+        upper = np.sqrt(np.einsum("ij,ij->i", differences, differences))
+        return clusters[np.zeros(len(vectors), dtype=np.intp)], upper, np.full(len(vectors), np.inf)
+
+    # the matrix product form of the distances rounds near ties either way, so it only ranks the centroids of
+    # points whose nearest centroid is clear by more than the rounding margin, the rest are compared exactly
+    distances = data_mining_utilities.pairwise_distances(vectors, centroid_matrix, "sqeuclidean")
+    margin = data_mining_utilities.ROUNDING_MARGIN * \
+        (np.einsum("ij,ij->i", vectors, vectors) + np.einsum("ij,ij->i", centroid_matrix, centroid_matrix).max())
+    nearest = distances.argmin(axis=1)
+    nearest_two = np.partition(distances, 1, axis=1)
+    unclear = np.flatnonzero(nearest_two[:, 1] - nearest_two[:, 0] <= margin)
+    nearest[unclear] = data_mining_utilities.pairwise_distances(vectors[unclear], centroid_matrix,
+                                                                exact=True).argmin(axis=1)
+
+    # exact distance to the nearest centroid, and the second nearest less the margin (a lower bound on it)
+    differences = vectors - centroid_matrix[nearest]
+    upper = np.sqrt(np.einsum("ij,ij->i", differences, differences))
+    distances[rows, nearest] = np.inf
+    lower = np.sqrt(np.maximum(distances.min(axis=1) - margin, 0.0))
+
+    return clusters[nearest], upper, lower
+
+
+def hamerly_assignment(vectors, centroids, clusters, labels, movements, bounds):
+    """ Nearest centroid assignment that skips data points whose bounds prove their label can't change """
+    # bounds are (upper, lower): an upper bound on the distance to the assigned centroid and a lower
+    # bound on the distance to any other centroid. Returns the labels, the new bounds and the number
+    # of distances computed
+    num_vectors = len(vectors)
+    if bounds is None:
+        labels, upper, lower = full_assignment(vectors, centroids, clusters)
+        return labels, (upper, lower), num_vectors * len(clusters)
+
+    upper, lower = bounds
+
+    # a centroid moving can only grow the distance to it (upper) or shrink the distance to it (lower)
+    cluster_movement = np.zeros(centroids.shape[0])
+    cluster_movement[clusters] = movements
+    upper = upper + cluster_movement[labels]
+
+    furthest = clusters[np.argmax(movements)]
+    largest_movements = np.sort(movements)[::-1]
+    second_largest = largest_movements[1] if len(movements) > 1 else 0.0
+    lower = lower - np.where(labels == furthest, second_largest, largest_movements[0])
+
+    # half the distance from each centroid to its nearest other centroid (triangle inequality bound)
+    centroid_distances = data_mining_utilities.pairwise_distances(centroids[clusters], centroids[clusters], exact=True)
+    np.fill_diagonal(centroid_distances, np.inf)
+    half_separation = np.zeros(centroids.shape[0])
+    half_separation[clusters] = centroid_distances.min(axis=1) / 2
+    bound = np.maximum(half_separation[labels], lower)
+
+    # only points whose assigned centroid isn't provably (strictly) the nearest need their distances
+    unsure = np.flatnonzero(upper * (1 + BOUND_SLACK) >= bound)
+    evaluations = len(unsure)
+
+    # tighten the upper bound with the exact distance to the assigned centroid first
+    differences = vectors[unsure] - centroids[labels[unsure]]
+    upper[unsure] = np.sqrt(np.einsum("ij,ij->i", differences, differences))
+    unsure = unsure[upper[unsure] * (1 + BOUND_SLACK) >= bound[unsure]]
+
+    labels = labels.copy()
+    labels[unsure], upper[unsure], lower[unsure] = full_assignment(vectors[unsure], centroids, clusters)
+    evaluations += len(unsure) * len(clusters)
+
+    return labels, (upper, lower), evaluations
+
+
+def lloyd(vectors, centroids, labels, tolerance=0.0, max_iterations=None, percentage_trimmed=0.1,
+          assignment="lloyd"):
+    """ Array-based k-means iterations from an initial labelling of the data points """
+    # returns the centroids (NaN rows for clusters that emptied), the labels, the non-empty clusters
+    # in order and a dict of statistics (iterations, distances computed and distances avoided)
+    if assignment not in ("lloyd", "hamerly"):
+        raise ValueError("Unknown assignment method: " + str(assignment))
+
+    centroids = np.array(centroids, dtype=np.float64)
+    labels = np.array(labels, dtype=np.intp)
+    num_clusters = centroids.shape[0]
+    bounds = None  # distance bounds kept between iterations by the accelerated assignment
+
+    statistics = {"iterations": 0, "distance_evaluations": 0, "distance_evaluations_avoided": 0}
+
+    while True:
+        with instrumentation.phase("k_means.update"):
+            # 'move' the centroids to better represent their cluster's centre
+            new_centroids = update_centroid_matrix(vectors, labels, num_clusters, percentage_trimmed)
+            clusters = cluster_order(labels)  # a cluster may have no vectors in it
+
+            # average distance each centroid moved since the last iteration
+            movements = np.sqrt(np.einsum("ij,ij->i", centroids[clusters] - new_centroids[clusters],
+                                          centroids[clusters] - new_centroids[clusters]))
+            average_centroid_movement = movements.mean()
+
+        # update the centroids and labels of data points, ties go to the first centroid in cluster order
+        centroids = new_centroids
+        with instrumentation.phase("k_means.assignment"):
+            if assignment == "hamerly":
+                labels, bounds, evaluations = hamerly_assignment(vectors, centroids, clusters, labels, movements,
+                                                                 bounds)
+            else:
+                labels = full_assignment(vectors, centroids, clusters)[0]
+                evaluations = len(vectors) * len(clusters)
+        instrumentation.count("k_means.distance_evaluations", evaluations)
+
+        statistics["iterations"] += 1
+        statistics["distance_evaluations"] += evaluations
+        statistics["distance_evaluations_avoided"] += len(vectors) * len(clusters) - evaluations
+
+        # repeat until the centroids settle (a local minimum when the tolerance is 0)
+        if average_centroid_movement <= tolerance or \
+                (max_iterations is not None and statistics["iterations"] >= max_iterations):
+            return centroids, labels, clusters, statistics
+
+
+def k_means(initial_centroids, initial_labelled_vectors, k, tolerance=0.0, max_iterations=None,
+            assignment="lloyd", statistics=None):
     """ Main k-means algorithm """
+    # assignment="hamerly" skips distance computations using the triangle inequality, with the same result.
+    # If a statistics dict is given it's updated with the iterations and distances computed/avoided
+
     # initialise the first centroids and unlabelled data points
-    centroids = initial_centroids
-    labelled_vectors = initial_labelled_vectors
+    cluster_ids = list(initial_centroids.keys())
+    position = {cluster_id: i for i, cluster_id in enumerate(cluster_ids)}
 
-    average_centroid_movement = float("inf")  # initialise to infinity
+    vectors = data_mining_utilities.as_float_array([vector[1] for vector in initial_labelled_vectors])
+    centroids = data_mining_utilities.as_float_array(list(initial_centroids.values()))
+    labels = [position[vector[0]] for vector in initial_labelled_vectors]
 
-    # repeat until the algorithm reaches a local minimum
-    while average_centroid_movement > 0:
-        # 'move' the centroids to better represent their cluster's centre
-        new_centroids = update_centroids(labelled_vectors)
+    centroids, labels, clusters, run_statistics = lloyd(vectors, centroids, labels, tolerance, max_iterations,
+                                                        assignment=assignment)
+    if statistics is not None:
+        statistics.update(run_statistics)
 
-        differences = []
-        for i in range(k):
-            if i in new_centroids.keys():  # a cluster may have no vectors in it
-                # calculate how far each centroid moved since the last iteration
-                differences.append(data_mining_utilities.euclidean_distance(centroids[i], new_centroids[i]))
+    final_centroids = collections.OrderedDict()
+    for cluster in clusters:
+        final_centroids[cluster_ids[cluster]] = centroids[cluster].tolist()
 
-        # average centroid movement
-        average_centroid_movement = data_mining_utilities.mean(differences)
+    labelled_vectors = []
+    for label, vector in zip(labels, initial_labelled_vectors):
+        labelled_vectors.append([cluster_ids[label], vector[1]])
+
+    return final_centroids, labelled_vectors
+
+
+def cluster_quality_array(vectors, centroids, labels, clusters):
+    """ Average intra-cluster variance of the clusters, from the arrays used by lloyd() """
+    differences = vectors - centroids[labels]
+    squared_distances = np.einsum("ij,ij->i", differences, differences)
+
+    counts = np.bincount(labels, minlength=centroids.shape[0])[clusters]
+    totals = np.bincount(labels, weights=squared_distances, minlength=centroids.shape[0])[clusters]
+
+    # a centroid can be left without data points by the final assignment, it has no variance to average
+    return float(np.mean(totals[counts > 0] / counts[counts > 0]))
+
+
+def _sweep_k(arrays, task):
+    """ Run k-means for one value of k using the first k starting centroids, returns the cluster quality """
+    k, options = task
+    vectors = arrays["vectors"]
+    centroids = arrays["centroids"][:k]
+
+    # label the data points with their closest centroid's label, then run k-means
+    with instrumentation.phase("k_means.assignment"):
+        labels = full_assignment(vectors, centroids, np.arange(k))[0]
+    centroids, labels, clusters, _ = lloyd(vectors, centroids, labels, **options)
+    return cluster_quality_array(vectors, centroids, labels, clusters)
 
-        # update the centroids and labels of data points
-        centroids = new_centroids
-        labelled_vectors = update_vectors(new_centroids, labelled_vectors)
 
-    return centroids, labelled_vectors
+def k_sweep(vectors, min_k, max_k, starting_centroids=None, seed=None, processes=None, tolerance=0.0,
+            max_iterations=None, assignment="lloyd", seeding="random"):
+    """ Cluster quality for every k in [min_k, max_k], with the runs spread across a process pool """
+    # every k starts from the first k of the same starting centroids, picked with the seed if not given,
+    # so the curve doesn't depend on how the runs are scheduled (the first k of a k-means++ seeding are
+    # themselves a k-means++ seeding)
+    if starting_centroids is None:
+        starting_centroids = initial_centroids(list(vectors), max_k, random.Random(seed), seeding)
 
+    vectors = data_mining_utilities.as_float_array(vectors)
+    centroids = data_mining_utilities.as_float_array(list(starting_centroids.values())[:max_k])
+    options = {"tolerance": tolerance, "max_iterations": max_iterations, "assignment": assignment}
 
-file = csv.DictReader(open('Data Mining - Spring 2017.csv'))
-ages, shoe_sizes, heights = load_attributes(file)  # apply cleaning rules
+    # the data is shared with the worker processes once, rather than pickled with every task,
+    # and larger k take longer, so they're handed out first for the pool to finish together
+    ks = list(range(max_k, min_k - 1, -1))
+    qualities = data_mining_utilities.parallel_map(_sweep_k, [(k, options) for k in ks],
+                                                   {"vectors": vectors, "centroids": centroids}, processes)
 
-""" Normalise numeric data using min/max """
-new_min = -1
-new_max = 1
-ages = data_mining_utilities.min_max_normalise(ages, new_min, new_max)
-shoe_sizes = data_mining_utilities.min_max_normalise(shoe_sizes, new_min, new_max)
-heights = data_mining_utilities.min_max_normalise(heights, new_min, new_max)
+    quality = collections.OrderedDict()
+    for k, run_quality in sorted(zip(ks, qualities)):
+        quality[k] = run_quality
+    return quality
 
-""" Recombine the cleaned/normalised attributes into 3-dimensional vectors """
-normalised_vectors = []
-for vector in zip(ages, shoe_sizes, heights):
-    normalised_vectors.append(vector)
 
-""" Run k-means using incrementing values of k 
-    (each iteration uses the same initial centroids created above, for consistency) """
-min_k = 1
-max_k = len(normalised_vectors)
-starting_centroids = initial_centroids(normalised_vectors, max_k)
+def main(file_name=data_mining_utilities.SURVEY_FILE, columns=ATTRIBUTE_COLUMNS, min_k=1, max_k=None, seed=None,
+         seeding="random", processes=None, tolerance=0.0, max_iterations=None, assignment="lloyd", new_min=-1,
+         new_max=1, cache_dir=data_mining_utilities.CACHE_DIRECTORY):
+    """ Print the cluster quality of k-means for every k in [min_k, max_k] on the survey's numeric attributes """
+    # apply cleaning rules and normalise numeric data using min/max (cached after the first run)
+    normalised_vectors = load_normalised_vectors(file_name, new_min, new_max, cache_dir, columns)
 
-for k in range(min_k, max_k + 1):
-    """ Set the first centroids to be the random initial centroids """
-    k_centroids = collections.OrderedDict()
-    for i in range(k):
-        k_centroids[i] = starting_centroids[i]
+    # run k-means using incrementing values of k
+    # (each iteration uses the same initial centroids created here, for consistency)
+    maximum_k = len(normalised_vectors) if max_k is None else max_k
+    random_generator = random if seed is None else random.Random(seed)
+    starting_centroids = initial_centroids(normalised_vectors, maximum_k, random_generator, seeding)
 
-    """ Label the data points with their closest centroid's label """
-    initial_labelled_vectors = initial_clusters(normalised_vectors, k_centroids)
+    # evaluate the quality of the clusters for each k (runs in parallel) by calculating the variance within the clusters
+    quality = k_sweep(normalised_vectors, min_k, maximum_k, starting_centroids, processes=processes,
+                      tolerance=tolerance, max_iterations=max_iterations, assignment=assignment)
+    for k, average_intra_cluster_variance in quality.items():
+        print(k, average_intra_cluster_variance)
 
-    """ Run k-means with the initial clusters and labelled vectors """
-    centroids, labelled_vectors = k_means(k_centroids, initial_labelled_vectors, k)
 
-    """ Evaluate the quality of the clusters by calculating the variance within the clusters """
-    average_intra_cluster_variance = cluster_quality(centroids, labelled_vectors)
-    print(k, average_intra_cluster_variance)
+if __name__ == '__main__':
+    main()
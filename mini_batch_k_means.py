@@ -0,0 +1,77 @@
+import numpy as np
+
+import data_mining_utilities
+
+
+class MiniBatchKMeans:
+    """ k-means updated from small batches of data points, so the full data never needs to be passed over """
+
+    def __init__(self, k, batch_size=100, max_iterations=100, tolerance=0.0, seed=None):
+        self.k = k
+        self.batch_size = batch_size
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.random = np.random.RandomState(seed)
+
+        self.centroids = None  # (k, dimensions) array, set by the first batch
+        self.counts = None  # number of data points that have updated each centroid so far
+
+    def _initialise(self, vectors):
+        """ Randomly select k data points of the first batch to be the initial centroids """
+        if len(vectors) < self.k:
+            raise ValueError("The first batch needs at least k = " + str(self.k) + " data points")
+
+        # random sampling of data points (without replacement)
+        self.centroids = vectors[self.random.choice(len(vectors), self.k, replace=False)].copy()
+        self.counts = np.zeros(self.k, dtype=np.int64)
+
+    def predict(self, vectors):
+        """ Label each data point with its nearest centroid """
+        distances = data_mining_utilities.pairwise_distances(vectors, self.centroids)
+        return distances.argmin(axis=1)
+
+    def partial_fit(self, vectors):
+        """ Update the centroids with one batch of data points, returns the average centroid movement """
+        vectors = data_mining_utilities.as_float_array(vectors)
+        if self.centroids is None:
+            self._initialise(vectors)
+
+        labels = self.predict(vectors)
+
+        batch_counts = np.bincount(labels, minlength=self.k)
+        batch_sums = np.zeros_like(self.centroids)
+        np.add.at(batch_sums, labels, vectors)
+
+        # each centroid moves towards its new points with a learning rate of 1 / (points seen by the centroid),
+        # which keeps it at the mean of every point ever assigned to it
+        updated = batch_counts > 0
+        self.counts += batch_counts
+        step = (batch_sums[updated] - batch_counts[updated, np.newaxis] * self.centroids[updated]) / \
+            self.counts[updated, np.newaxis]
+        self.centroids[updated] += step
+
+        movements = np.zeros(self.k)
+        movements[updated] = np.sqrt(np.einsum("ij,ij->i", step, step))
+        return float(movements.mean())
+
+    def fit(self, vectors):
+        """ Fit the centroids to random batches of the data points """
+        vectors = data_mining_utilities.as_float_array(vectors)
+
+        for _ in range(self.max_iterations):
+            # sampled with replacement, drawing without replacement costs a permutation of every point per batch
+            batch = vectors[self.random.randint(0, len(vectors), self.batch_size)]
+            if self.centroids is None:
+                self._initialise(vectors)
+
+            # stop once the centroids settle
+            if self.partial_fit(batch) <= self.tolerance:
+                break
+
+        return self
+
+    def fit_stream(self, chunks):
+        """ Fit the centroids to a stream of chunks (e.g. new survey rows), one pass over each chunk """
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
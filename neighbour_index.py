@@ -0,0 +1,140 @@
+import heapq
+
+import numpy as np
+
+import data_mining_utilities
+
+BRUTE_FORCE_MIN_DIMENSIONS = 16  # KD-tree pruning stops paying off in high dimensions
+BRUTE_FORCE_K_RATIO = 300  # a KD-tree query costs about as much per neighbour as brute force does per 300 vectors
+PRUNING_SLACK = 1e-12  # relative slack so rounding in the box distances never prunes a true neighbour
+
+
+def nearest_neighbour_indices(distances, k):
+    """ Indices of the k smallest distances in each row, ordered by (distance, index) like a stable sort """
+    rows = np.arange(distances.shape[0])[:, np.newaxis]
+    kth_distance = np.partition(distances, k - 1, axis=1)[:, k - 1: k]
+
+    # everything up to the k-th distance, except in rows where more points tie with it than there is room for,
+    # which take everything closer and then the earliest of the tied points
+    selected = distances <= kth_distance
+    crowded = np.flatnonzero(selected.sum(axis=1) > k)
+    if len(crowded):
+        closer = distances[crowded] < kth_distance[crowded]
+        tied = distances[crowded] == kth_distance[crowded]
+        tied_rank = np.cumsum(tied, axis=1)
+        selected[crowded] = closer | (tied & (tied_rank <= k - closer.sum(axis=1, keepdims=True)))
+
+    indices = np.nonzero(selected)[1].reshape(-1, k)  # in index order within each row
+    order = np.argsort(distances[rows, indices], axis=1, kind="stable")
+    return indices[rows, order]
+
+
+class NeighbourIndex:
+    """ k-nearest neighbour index over a fixed set of vectors (KD-tree, or brute force in high dimensions) """
+
+    def __init__(self, vectors, leaf_size=16, method="auto"):
+        self.vectors = data_mining_utilities.as_float_array(vectors)
+        self.leaf_size = max(1, leaf_size)
+
+        num_vectors, num_dimensions = self.vectors.shape
+        if method == "auto":
+            if num_dimensions >= BRUTE_FORCE_MIN_DIMENSIONS or num_vectors <= self.leaf_size:
+                method = "brute"
+            else:
+                method = "kd_tree"
+        if method not in ("kd_tree", "brute"):
+            raise ValueError("Unknown neighbour index method: " + str(method))
+        self.method = method
+
+        if self.method == "kd_tree":
+            self._build_tree()
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _build_tree(self):
+        """ Recursively split the vectors on the dimension with the largest spread, at the median """
+        # each node is [start, end, lower bounds, upper bounds, left child, right child]
+        # the vectors in a node are self.permutation[start:end]
+        self.permutation = np.arange(len(self))
+        self.nodes = []
+
+        stack = [(0, len(self), None, None)]  # (start, end, parent node, is left child)
+        while stack:
+            start, end, parent, is_left = stack.pop()
+            node_vectors = self.vectors[self.permutation[start:end]]
+            lower = node_vectors.min(axis=0)
+            upper = node_vectors.max(axis=0)
+
+            node_id = len(self.nodes)
+            self.nodes.append([start, end, lower, upper, None, None])
+            if parent is not None:
+                self.nodes[parent][4 if is_left else 5] = node_id
+
+            if end - start <= self.leaf_size:
+                continue  # leaf node
+
+            split_dimension = int(np.argmax(upper - lower))
+            if upper[split_dimension] == lower[split_dimension]:
+                continue  # every vector in the node is identical, it can't be split
+
+            # partial selection of the median rather than a full sort
+            middle = (end - start) // 2
+            order = np.argpartition(node_vectors[:, split_dimension], middle, kind="introselect")
+            self.permutation[start:end] = self.permutation[start:end][order]
+
+            stack.append((start + middle, end, node_id, False))
+            stack.append((start, start + middle, node_id, True))
+
+    def _box_distance(self, vector, node):
+        """ Lower bound on the distance from a vector to anything inside a node's bounding box """
+        gaps = np.maximum(node[2] - vector, 0) + np.maximum(vector - node[3], 0)
+        return float(np.sqrt(np.dot(gaps, gaps)))
+
+    def query(self, vector, k):
+        """ Get the indices and distances of the k nearest vectors, ordered by (distance, index) """
+        vector = data_mining_utilities.as_float_array(vector)[0]
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+        # for large k the tree visits most leaves and pushes every candidate through a Python heap,
+        # a vectorised pass over all of the vectors is cheaper
+        if self.method == "brute" or k * BRUTE_FORCE_K_RATIO > len(self):
+            distances = data_mining_utilities.distances_to(vector, self.vectors)
+            order = nearest_neighbour_indices(distances[np.newaxis, :], k)[0]  # ties keep the original order
+            return order, distances[order]
+
+        best = []  # max-heap of (-distance, -index) holding the k best neighbours found so far
+
+        def worst_distance():
+            return -best[0][0] if len(best) == k else float("inf")
+
+        def search(node_id):
+            node = self.nodes[node_id]
+            start, end, _, _, left, right = node
+
+            if left is None:  # leaf node, compare against every vector in it
+                indices = self.permutation[start:end]
+                distances = data_mining_utilities.distances_to(vector, self.vectors[indices])
+                for index, distance in zip(indices.tolist(), distances.tolist()):
+                    candidate = (-distance, -index)
+                    if len(best) < k:
+                        heapq.heappush(best, candidate)
+                    elif candidate > best[0]:
+                        heapq.heapreplace(best, candidate)
+                return
+
+            # visit the nearer child first so the further one is more likely to be pruned
+            children = [(self._box_distance(vector, self.nodes[child]), child) for child in (left, right)]
+            children.sort()
+            for box_distance, child in children:
+                if box_distance <= worst_distance() * (1 + PRUNING_SLACK):
+                    search(child)
+
+        search(0)
+
+        neighbours = sorted((-distance, -index) for distance, index in best)
+        indices = np.array([index for _, index in neighbours], dtype=np.intp)
+        distances = np.array([distance for distance, _ in neighbours], dtype=np.float64)
+        return indices, distances
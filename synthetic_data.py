@@ -0,0 +1,102 @@
+import bisect
+import random
+
+import numpy as np
+
+
+def gaussian_blob_points(num_blobs, points_per_blob, num_dimensions=2, seed=0, spread=0.5):
+    """ Well separated Gaussian clusters, as a points array and the blob each point came from """
+    numpy_random = np.random.RandomState(seed)
+    centres = numpy_random.uniform(-10, 10, size=(num_blobs, num_dimensions))
+    points = np.concatenate([numpy_random.normal(centre, spread, size=(points_per_blob, num_dimensions))
+                             for centre in centres])
+    blobs = np.repeat(np.arange(num_blobs), points_per_blob)
+    return points, blobs
+
+
+def gaussian_blobs(num_blobs, points_per_blob, num_dimensions=2, seed=0):
+    """ Well separated Gaussian clusters, as a list of vectors """
+    points, _ = gaussian_blob_points(num_blobs, points_per_blob, num_dimensions, seed)
+    return [tuple(point) for point in points]
+
+
+def labelled_gaussian_blobs(num_blobs, points_per_blob, num_dimensions=2, seed=0, spread=0.5):
+    """ Gaussian clusters as labelled vectors (label followed by the attributes, as kNN expects) in random order """
+    points, blobs = gaussian_blob_points(num_blobs, points_per_blob, num_dimensions, seed, spread)
+    order = np.random.RandomState(seed + 1).permutation(len(points))  # so any leading split sees every blob
+
+    labelled_vectors = []
+    for blob, point in zip(blobs[order], points[order].tolist()):
+        labelled_vectors.append(("blob " + str(blob),) + tuple(point))
+
+    return labelled_vectors
+
+
+def quest_patterns(num_patterns, num_items, average_pattern_length, numpy_random, correlation=0.5):
+    """ Potentially frequent itemsets of the IBM Quest generator, with their weights and corruption levels """
+    patterns = []
+    previous = np.empty(0, dtype=np.int64)
+
+    for _ in range(num_patterns):
+        length = min(max(1, numpy_random.poisson(average_pattern_length)), num_items)
+
+        # consecutive patterns share some items, an exponentially distributed fraction of the new pattern
+        num_shared = min(int(round(min(numpy_random.exponential(correlation), 1.0) * length)), len(previous))
+        shared = numpy_random.choice(previous, num_shared, replace=False) if num_shared else previous[:0]
+
+        candidates = np.setdiff1d(np.arange(num_items), shared)
+        fresh = numpy_random.choice(candidates, length - num_shared, replace=False)
+        pattern = np.concatenate([shared, fresh])
+
+        patterns.append(pattern)
+        previous = pattern
+
+    weights = numpy_random.exponential(1.0, num_patterns)
+    weights /= weights.sum()
+    corruption = np.clip(numpy_random.normal(0.5, 0.1, num_patterns), 0.0, 1.0)
+
+    return patterns, weights, corruption
+
+
+def quest_transactions(num_transactions, num_items=1000, average_transaction_length=10, average_pattern_length=4,
+                       num_patterns=2000, seed=0):
+    """ IBM Quest style market baskets (Agrawal & Srikant, 1994) as lists of item names """
+    # every basket is filled with weighted random patterns, each corrupted by dropping some of its items,
+    # so itemsets of the patterns are frequent at a range of supports like real baskets
+    numpy_random = np.random.RandomState(seed)
+    patterns, weights, corruption = quest_patterns(num_patterns, num_items, average_pattern_length, numpy_random)
+    patterns = [pattern.tolist() for pattern in patterns]
+    corruption = corruption.tolist()
+    item_names = ["item " + str(item) for item in range(num_items)]
+
+    # the per-item work is small, the standard library generator (seeded from numpy's) is faster for it
+    random_generator = random.Random(numpy_random.randint(2 ** 31))
+    cumulative_weights = np.cumsum(weights).tolist()
+
+    def next_pattern():
+        index = min(bisect.bisect_right(cumulative_weights, random_generator.random()), num_patterns - 1)
+        pattern = list(patterns[index])
+        # items are dropped one at a time while a uniform draw stays below the pattern's corruption level
+        while pattern and random_generator.random() < corruption[index]:
+            pattern.pop(random_generator.randrange(len(pattern)))
+        return pattern
+
+    transactions = []
+    carried = None  # a pattern that didn't fit is put in the next basket instead
+    for length in np.maximum(1, numpy_random.poisson(average_transaction_length, num_transactions)).tolist():
+        basket = set()
+        while len(basket) < length:
+            if carried is not None:
+                pattern, carried = carried, None
+            else:
+                pattern = next_pattern()
+
+            # a pattern that overflows the basket goes in anyway half of the time, otherwise in the next basket
+            if basket and len(basket) + len(pattern) > length and random_generator.random() < 0.5:
+                carried = pattern
+                break
+            basket.update(pattern)
+
+        transactions.append([item_names[item] for item in sorted(basket)])
+
+    return transactions